@@ -1,14 +1,31 @@
 import streamlit as st
-import numpy as np
+import pandas as pd
+import folium
+from streamlit_folium import st_folium
 import logging
 import json
 import re
-import geopandas as gpd
-from shapely.geometry import shape
-
-from models import Address, Coordinates, Property, SlopeData, EnvironmentalCheck, FeasibilityReport, SlopeAnalysis
-from geo_processing import geocode_address, extract_property, calculate_slope, check_environmental_hazards, create_map, HAZARD_FILES
-from gemini_analysis import analyze_location, analyze_slope, generate_feasibility_report, chat_with_report
+import threading
+from typing import List, Optional
+
+from pydantic import ValidationError
+
+from models import (
+    Address, Coordinates, Property, SlopeData, EnvironmentalCheck, FeasibilityReport, SlopeAnalysis,
+    LocationAnalysis, ParcelInputs, ParcelAnalysis,
+)
+from geo_processing import (
+    geocode_address, extract_property, calculate_slope, check_environmental_hazards, calculate_shoreline_distance,
+    create_map, get_parcel_index, get_contour_index, get_hazard_overlay, get_shoreline_index,
+    get_property_by_pin, property_coordinates, get_local_geocoder, calculate_slope_distribution,
+    HAZARD_FILES, CONTOUR_FILE, PROPERTY_FILE, SHORELINE_FILE,
+)
+from layer_registry import registry, LayerRegistry
+from local_geocoder import house_number, normalize_street
+from gemini_analysis import (
+    analyze_location_and_slope, stream_feasibility_report, chat_with_report, prompt_version, REPORT,
+)
+from report_cache import report_cache
 
 # Configure logging to ensure INFO level logs are visible
 logging.basicConfig(level=logging.INFO)
@@ -22,16 +39,33 @@ GEOJSON_FILES = {
     "Seismic Hazard": "data/Mercer_Island_Environmental_Layers_Seismic.geojson",
     "Steep Slope Hazard": "data/Mercer_Island_Environmental_Layers_SteepSlope.geojson",
     "Watercourse Buffer": "data/Mercer_Island_Environmental_Layers_WatercourseBufferSetback.geojson",
-    "Shoreline": "data/Mercer_Island_Lake_Washington_Shoreline_Full.geojson",  # Updated
+    "Shoreline": SHORELINE_FILE,
 }
-
-# Cache the shoreline GeoDataFrame at startup to improve performance
-try:
-    SHORELINE_GDF = gpd.read_file(GEOJSON_FILES["Shoreline"]).to_crs("EPSG:32610")
-    logging.info("Shoreline GeoDataFrame loaded and cached successfully.")
-except Exception as e:
-    logging.error(f"Failed to load Shoreline GeoDataFrame: {e}")
-    SHORELINE_GDF = None
+MERCER_ISLAND_CENTER = (47.5650, -122.2260)  # Initial view of the parcel picker map
+
+def warm_layer_registry() -> None:
+    """Load every shared layer and build the island-wide indexes."""
+    registry.preload([PROPERTY_FILE, CONTOUR_FILE, *HAZARD_FILES.values(), *GEOJSON_FILES.values()])
+    get_parcel_index()
+    get_contour_index()
+    get_hazard_overlay()
+    get_shoreline_index()
+    logging.info(f"Layer registry loaded with {len(registry)} shared layers.")
+
+@st.cache_resource
+def load_layer_registry() -> LayerRegistry:
+    """Warm the process-wide layer registry once in the background; every session shares its frames.
+
+    Requests that arrive before it is warm read only the features around their parcel.
+    """
+    threading.Thread(target=warm_layer_registry, name="layer-registry-warmup", daemon=True).start()
+    return registry
+
+def use_suggestion() -> None:
+    """Copy the picked address suggestion into the street input."""
+    suggestion = st.session_state.street_suggestion
+    if suggestion:
+        st.session_state.street = suggestion
 
 def log_feedback(user_input: str, model_output: str, feedback: str):
     """Log user feedback to a file for review."""
@@ -39,7 +73,7 @@ def log_feedback(user_input: str, model_output: str, feedback: str):
         f.write(f"Input: {user_input}\nOutput: {model_output}\nFeedback: {feedback}\n\n")
 
 def perform_analysis(street: str, zip_code: str) -> None:
-    """Perform the full property analysis and store results in session state."""
+    """Geocode an address, find its parcel and run the full analysis."""
     address_str = f"{street}, Mercer Island, WA"
     if zip_code:
         address_str += f", {zip_code}"
@@ -49,94 +83,332 @@ def perform_analysis(street: str, zip_code: str) -> None:
     if not coordinates:
         st.error("Failed to geocode address. Please check the input and try again.")
         return
-
-    st.session_state.coordinates = coordinates
-    st.session_state.address = address_str
     st.success(f"Geocoded Address: ({coordinates.latitude}, {coordinates.longitude})")
 
     property_data = extract_property(coordinates)
     if not property_data:
         st.error("No property found at the given coordinates.")
         return
+    analyze_parcel(property_data, coordinates, address_str)
+
+def perform_pin_analysis(pin: str) -> None:
+    """Look a parcel up by PIN and run the full analysis, without geocoding."""
+    property_data = get_property_by_pin(pin)
+    if not property_data:
+        st.error(f"No parcel found with PIN {pin}. Please check the number and try again.")
+        return
+    analyze_parcel(property_data, property_coordinates(property_data), f"Parcel {property_data.parcel_id}, Mercer Island, WA")
+
+def perform_click_analysis(latitude: float, longitude: float) -> None:
+    """Find the parcel under a map click and run the full analysis, without geocoding."""
+    coordinates = Coordinates(latitude=latitude, longitude=longitude)
+    property_data = extract_property(coordinates)
+    if not property_data:
+        st.error("No parcel found at the clicked point. Please click inside a parcel.")
+        return
+    analyze_parcel(property_data, coordinates, f"Parcel {property_data.parcel_id}, Mercer Island, WA")
+
+def store_parcel_analysis(
+    inputs: ParcelInputs,
+    location_analysis: Optional[LocationAnalysis],
+    slope_analysis: Optional[SlopeAnalysis],
+    feasibility_report: Optional[FeasibilityReport],
+) -> None:
+    """Put a parcel's inputs, analyses and report into session state for display and chat."""
+    st.session_state.slope_data = inputs.slope_data
+    st.session_state.environmental_check = inputs.environmental_check
+    st.session_state.lake_proximity_distance = inputs.shoreline_distance  # Store for display
+    st.session_state.slope_distribution = inputs.slope_distribution
+    st.session_state.location_analysis = location_analysis
+    st.session_state.slope_analysis = slope_analysis or SlopeAnalysis(
+        summary="Slope analysis failed due to processing error.",
+        recommendations=[],
+        verification_needed=["Slope data processing"],
+    )
+    st.session_state.feasibility_report = feasibility_report
+
+def analyze_parcel(property_data: Property, coordinates: Coordinates, address_str: str) -> None:
+    """Perform the full property analysis and store results in session state.
+
+    A parcel analyzed before under the same data layers and prompts is served from the
+    report cache without any geometry or Gemini work.
+    """
+    st.session_state.coordinates = coordinates
+    st.session_state.address = address_str
     st.session_state.property = property_data
+    st.session_state.feasibility_report = None
+    st.session_state.report_request = None
+
+    version, prompts = registry.data_version(), prompt_version()
+    cached = report_cache.get(property_data, prompts, version)
+    if cached is not None:
+        logging.info(f"Serving the cached analysis of parcel {property_data.parcel_id}")
+        store_parcel_analysis(**dict(cached))
+        return
 
     slope_data = calculate_slope(property_data)
     if not slope_data:
         st.error("Failed to calculate slope data.")
         return
     logging.info(
-        f"Slope Data - Average: {slope_data.average_slope}, Max: {slope_data.max_slope}, Distance: {slope_data.average_distance}"
+        f"Slope Data - Average: {slope_data.average_slope}, Max: {slope_data.max_slope}, Elevation difference: {slope_data.elevation_difference}"
     )
-    st.session_state.slope_data = slope_data
 
     environmental_check = check_environmental_hazards(property_data)
     if not environmental_check:
         st.error("Failed to check environmental hazards.")
         return
-    st.session_state.environmental_check = environmental_check
 
-    # Calculate lake proximity using the cached SHORELINE_GDF
-    property_geom = shape(property_data.geometry)
-    property_geom_proj = gpd.GeoSeries([property_geom], crs="EPSG:4326").to_crs("EPSG:32610")[0]
-    if SHORELINE_GDF is not None:
-        distance_to_shoreline = SHORELINE_GDF.distance(property_geom_proj).min()
+    # Lake proximity comes from the precomputed shoreline distance (or the shoreline segment index)
+    distance_to_shoreline = calculate_shoreline_distance(property_data)
+    if distance_to_shoreline is not None:
         logging.debug(f"Distance to shoreline: {distance_to_shoreline:.2f}m")
         lake_proximity = distance_to_shoreline <= 100  # Distance in meters
-        st.session_state.lake_proximity_distance = distance_to_shoreline  # Store for display
     else:
-        logging.error("Shoreline GeoDataFrame not available for lake proximity calculation.")
+        logging.error("Shoreline distance not available for lake proximity calculation.")
         lake_proximity = False
-        st.session_state.lake_proximity_distance = None
+    inputs = ParcelInputs(
+        slope_data=slope_data,
+        environmental_check=environmental_check,
+        shoreline_distance=distance_to_shoreline,
+        slope_distribution=calculate_slope_distribution(property_data),
+    )
+
+    # A data change that left this parcel's inputs alone keeps its report
+    cached = report_cache.get_for_inputs(property_data, prompts, version, inputs)
+    if cached is not None:
+        logging.info(f"Inputs of parcel {property_data.parcel_id} are unchanged; serving its cached report")
+        store_parcel_analysis(**dict(cached))
+        return
 
-    with st.spinner("Performing location analysis..."):
-        location_analysis = analyze_location(
+    # The location and slope analyses run concurrently; the report is streamed into the Analysis tab
+    with st.spinner("Performing location and slope analysis..."):
+        location_analysis, slope_analysis = analyze_location_and_slope(
             latitude=coordinates.latitude,
             longitude=coordinates.longitude,
             address=address_str,
             hazards=environmental_check.model_dump(),
+            slope_data=slope_data,
             lake_proximity=lake_proximity,
+            slope_distribution=inputs.slope_distribution,
         )
-    st.session_state.location_analysis = location_analysis
+    store_parcel_analysis(inputs, location_analysis, slope_analysis, None)
+    st.session_state.report_request = {
+        "report_args": {
+            "address": address_str,
+            "slope_analysis": slope_analysis,
+            "location_analysis": location_analysis,
+            "environmental_hazards": environmental_check.model_dump(),
+            "slope_data": slope_data,
+            "lake_proximity": lake_proximity,
+            "slope_distribution": inputs.slope_distribution,
+        },
+        "property": property_data,
+        "inputs": inputs,
+        "prompt_version": prompts,
+        "data_version": version,
+    }
 
-    with st.spinner("Performing slope analysis..."):
-        elevation_diff = slope_data.average_distance * np.tan(np.radians(slope_data.average_slope))
-        slope_analysis = analyze_slope(
-            slope=slope_data.average_slope,
-            elevation_diff=elevation_diff,
-            distance=slope_data.average_distance,
-            lake_proximity=lake_proximity,
+# The rest of your app.py remains unchanged
+def render_recommendation(rec: str, source: str, key_prefix: str) -> None:
+    """Show one recommendation as a priority-colored card with a feedback button."""
+    priority = rec.split("]:")[0][1:].lower()
+    card_class = f"{priority}-card"
+    parts = rec.split(" - Confidence: ")
+    if len(parts) == 2:
+        body = parts[0]
+        confidence = "Confidence: " + parts[1]
+        priority_part, body_part = body.split("]: ", 1)
+        styled_rec = (
+            f'<span class="priority-label">{priority_part}]:</span> '
+            f'{body_part} - <span class="confidence-level">{confidence}</span>'
         )
-        if slope_analysis:
-            st.session_state.slope_analysis = slope_analysis
+    else:
+        styled_rec = rec
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.markdown(f'<div class="{card_class}">{styled_rec}</div>', unsafe_allow_html=True)
+    with col2:
+        if st.button("Flag This", key=f"{key_prefix}_{rec[:50]}"):
+            log_feedback(source, rec, "User flagged as inconsistent")
+            st.success("Feedback logged.")
+
+def render_overall_feasibility(overall_feasibility: str) -> None:
+    st.markdown(
+        f'<div class="feasibility-title">Overall Feasibility: {overall_feasibility}</div>',
+        unsafe_allow_html=True,
+    )
+
+def render_feasibility_warning(report: FeasibilityReport) -> None:
+    """Point out a 'Marginally Feasible' rating that the flat slope and absent hazards do not support."""
+    try:
+        if (
+            report.overall_feasibility.startswith("Marginally")
+            and hasattr(report, "slope_analysis")
+            and report.slope_analysis
+            and "flat" in report.slope_analysis.summary.lower()
+            and hasattr(report, "hazard_layers")
+            and report.hazard_layers
+            and not any("Present" in h.split(":")[1].strip() for h in report.hazard_layers)
+        ):
+            st.warning(
+                "The 'Marginally Feasible' rating may be overly conservative given the flat slope and absence of hazards. "
+                "Consider verifying soil bearing capacity to confirm a higher feasibility rating (e.g., 'Highly Feasible')."
+            )
+    except AttributeError as e:
+        logging.error(f"Error checking feasibility mismatch: {e}")
+
+def render_hazard_layers(hazard_layers: List[str]) -> None:
+    with st.expander("Hazard Layer Information", expanded=True):
+        if hazard_layers:
+            for hazard in hazard_layers:
+                is_present = "Present" in hazard and "Not Present" not in hazard
+                logging.info(f"Hazard: {hazard}, is_present: {is_present}")
+                st.markdown(
+                    f'<div class="{"hazard-present" if is_present else "hazard-absent"}">'
+                    f'<span class="{"status-dot-present" if is_present else "status-dot-absent"}"></span>'
+                    f"{hazard}</div>",
+                    unsafe_allow_html=True,
+                )
+        else:
+            st.write("Hazard layer information unavailable.")
+
+def render_lake_proximity() -> None:
+    with st.expander("Lake Proximity Information"):
+        distance = st.session_state.get("lake_proximity_distance")
+        if distance is not None:
+            is_near = distance <= 100
+            st.markdown(
+                f'<div class="{"hazard-present" if is_near else "hazard-absent"}">'
+                f'<span class="{"status-dot-present" if is_near else "status-dot-absent"}"></span>'
+                f"Lake Proximity: {'Within 100m' if is_near else 'Beyond 100m'} - Distance to shoreline: {distance:.1f} meters</div>",
+                unsafe_allow_html=True,
+            )
         else:
-            st.session_state.slope_analysis = SlopeAnalysis(
-                summary="Slope analysis failed due to processing error.",
-                recommendations=[],
-                verification_needed=["Slope data processing"],
+            st.write("Lake proximity data unavailable.")
+
+def render_slope_distribution() -> None:
+    with st.expander("Slope Distribution"):
+        distribution = st.session_state.get("slope_distribution")
+        if distribution is not None:
+            st.write(
+                f"**Median:** {distribution.p50_slope:.1f}° · **90th percentile:** {distribution.p90_slope:.1f}° · "
+                f"**99th percentile:** {distribution.p99_slope:.1f}°"
+            )
+            st.write(
+                f"Share of parcel area steeper than 15°: {distribution.fraction_above_15:.0%}, "
+                f"25°: {distribution.fraction_above_25:.0%}, 40°: {distribution.fraction_above_40:.0%}"
             )
+            bins = distribution.histogram_bins
+            labels = [f"{low:g}–{high:g}°" for low, high in zip(bins[:-1], bins[1:])]
+            st.bar_chart(pd.DataFrame({"Share of parcel area": distribution.histogram}, index=labels))
+        else:
+            st.write("Slope distribution unavailable.")
+
+def render_location_analysis(location_analysis: Optional[LocationAnalysis]) -> None:
+    with st.expander("Location Analysis"):
+        st.write("**Summary:**", location_analysis.summary if location_analysis else "Analysis unavailable")
+        if location_analysis and location_analysis.recommendations:
+            st.write("**Recommendations:**")
+            for rec in location_analysis.recommendations:
+                render_recommendation(rec, "Location Analysis", "loc")
+
+def render_slope_analysis(slope_analysis: Optional[SlopeAnalysis]) -> None:
+    with st.expander("Slope Analysis"):
+        if slope_analysis:
+            st.write("**Summary:**", slope_analysis.summary)
+            if slope_analysis.recommendations:
+                st.write("**Recommendations:**")
+                for rec in slope_analysis.recommendations:
+                    render_recommendation(rec, "Slope Analysis", "slope")
+        else:
+            st.write("**Summary:**", "Slope analysis unavailable or failed.")
+
+def render_detailed_recommendations(recommendations: List[str]) -> None:
+    with st.expander("Detailed Recommendations"):
+        if recommendations:
+            for rec in recommendations:
+                render_recommendation(rec, "Detailed Recommendations", "detail")
+        else:
+            st.write("No detailed recommendations available.")
 
+def render_verification_needed(verification_needed: List[str]) -> None:
+    with st.expander("Verification Needed"):
+        if verification_needed:
+            st.write("**Additional Data Required:**")
+            for item in verification_needed:
+                st.markdown(f"- {item}")
+        else:
+            st.write("No additional verification required based on current data.")
+
+# Report fields and how each is rendered; nested analyses arrive from the stream as plain dicts
+SECTION_RENDERERS = {
+    "overall_feasibility": (render_overall_feasibility, None),
+    "hazard_layers": (render_hazard_layers, None),
+    "location_analysis": (render_location_analysis, LocationAnalysis),
+    "slope_analysis": (render_slope_analysis, SlopeAnalysis),
+    "detailed_recommendations": (render_detailed_recommendations, None),
+    "verification_needed": (render_verification_needed, None),
+}
+# Display order of the report sections
+REPORT_SECTIONS = [
+    "overall_feasibility", "feasibility_warning", "hazard_layers", "lake_proximity", "slope_distribution",
+    "location_analysis", "slope_analysis", "detailed_recommendations", "verification_needed",
+]
+
+def render_section(slot, section: str, value) -> None:
+    """Render one report field into its placeholder."""
+    render, model = SECTION_RENDERERS[section]
+    if model is not None and isinstance(value, dict):
+        value = model(**value)
+    with slot.container():
+        render(value)
+
+def stream_report(request: dict, slots: dict) -> Optional[FeasibilityReport]:
+    """Generate the pending feasibility report, rendering each section as soon as the model completes it."""
+    rendered = set()
+    report = None
     with st.spinner("Generating feasibility report..."):
-        environmental_hazards = environmental_check.model_dump()
-        feasibility_report = generate_feasibility_report(
-            address=address_str,
-            slope_analysis=slope_analysis,
-            location_analysis=location_analysis,
-            environmental_hazards=environmental_hazards,
-            slope_data=slope_data,
-            lake_proximity=lake_proximity,
-        )
-    st.session_state.feasibility_report = feasibility_report
+        for section, value in stream_feasibility_report(**request["report_args"]):
+            if section == REPORT:
+                report = value
+            elif section in SECTION_RENDERERS and section not in rendered:
+                try:
+                    render_section(slots[section], section, value)
+                    rendered.add(section)
+                except (ValidationError, TypeError) as e:
+                    # Left for the validated report to fill in
+                    logging.warning(f"Could not render streamed section {section}: {e}")
+    st.session_state.report_request = None
+    if report is None:
+        # The streamed sections belong to a report that did not validate; do not leave half of it up
+        for section in rendered:
+            slots[section].empty()
+        return None
+    st.session_state.feasibility_report = report
+    report_cache.put(request["property"], request["prompt_version"], request["data_version"], ParcelAnalysis(
+        inputs=request["inputs"],
+        location_analysis=request["report_args"]["location_analysis"],
+        slope_analysis=request["report_args"]["slope_analysis"],
+        feasibility_report=report,
+    ))
+    for section in FeasibilityReport.model_fields:
+        if section not in rendered:
+            render_section(slots[section], section, getattr(report, section))
+    return report
 
-# The rest of your app.py remains unchanged
 def display_report():
     """Display the feasibility report with styled sections, feedback buttons, and verification needs."""
-    required_keys = ["coordinates", "property", "feasibility_report"]
-    if not all(key in st.session_state and st.session_state[key] is not None for key in required_keys):
+    required_keys = ["coordinates", "property"]
+    pending = st.session_state.get("report_request") is not None
+    if not all(key in st.session_state and st.session_state[key] is not None for key in required_keys) or not (
+        pending or st.session_state.get("feasibility_report") is not None
+    ):
         st.info("No analysis results available yet. Please enter an address and click 'Analyze Property'.")
         return
 
     report = st.session_state.feasibility_report
-    if not (hasattr(report, "location_analysis") and hasattr(report, "slope_analysis")):
+    if not pending and not (hasattr(report, "location_analysis") and hasattr(report, "slope_analysis")):
         st.warning("Feasibility report is incomplete. Please re-run the analysis.")
         return
 
@@ -303,151 +575,25 @@ def display_report():
                 )
                 create_map(st.session_state.coordinates, st.session_state.property, GEOJSON_FILES)
 
-    # Display Overall Feasibility with UI Feedback
-    st.markdown(
-        f'<div class="feasibility-title">Overall Feasibility: {report.overall_feasibility}</div>',
-        unsafe_allow_html=True,
-    )
-
-    # Add UI feedback for potential feasibility mismatch
-    try:
-        if (
-            report.overall_feasibility.startswith("Marginally")
-            and hasattr(report, "slope_analysis")
-            and report.slope_analysis
-            and "flat" in report.slope_analysis.summary.lower()
-            and hasattr(report, "hazard_layers")
-            and report.hazard_layers
-            and not any("Present" in h.split(":")[1].strip() for h in report.hazard_layers)
-        ):
-            st.warning(
-                "The 'Marginally Feasible' rating may be overly conservative given the flat slope and absence of hazards. "
-                "Consider verifying soil bearing capacity to confirm a higher feasibility rating (e.g., 'Highly Feasible')."
-            )
-    except AttributeError as e:
-        logging.error(f"Error checking feasibility mismatch: {e}")
-
-    with st.expander("Hazard Layer Information", expanded=True):
-        if hasattr(report, "hazard_layers"):
-            for hazard in report.hazard_layers:
-                is_present = "Present" in hazard and "Not Present" not in hazard
-                logging.info(f"Hazard: {hazard}, is_present: {is_present}")
-                st.markdown(
-                    f'<div class="{"hazard-present" if is_present else "hazard-absent"}">'
-                    f'<span class="{"status-dot-present" if is_present else "status-dot-absent"}"></span>'
-                    f"{hazard}</div>",
-                    unsafe_allow_html=True,
-                )
-        else:
-            st.write("Hazard layer information unavailable.")
-
-    # Add Lake Proximity Information
-    with st.expander("Lake Proximity Information"):
-        if "lake_proximity_distance" in st.session_state:
-            distance = st.session_state.lake_proximity_distance
-            is_near = distance <= 100
-            st.markdown(
-                f'<div class="{"hazard-present" if is_near else "hazard-absent"}">'
-                f'<span class="{"status-dot-present" if is_near else "status-dot-absent"}"></span>'
-                f"Lake Proximity: {'Within 100m' if is_near else 'Beyond 100m'} - Distance to shoreline: {distance:.1f} meters</div>",
-                unsafe_allow_html=True,
-            )
-        else:
-            st.write("Lake proximity data unavailable.")
-
-    with st.expander("Location Analysis"):
-        st.write(
-            "**Summary:**",
-            report.location_analysis.summary if report.location_analysis else "Analysis unavailable",
-        )
-        if report.location_analysis and hasattr(report.location_analysis, "recommendations"):
-            st.write("**Recommendations:**")
-            for rec in report.location_analysis.recommendations:
-                priority = rec.split("]:")[0][1:].lower()
-                card_class = f"{priority}-card"
-                parts = rec.split(" - Confidence: ")
-                if len(parts) == 2:
-                    body = parts[0]
-                    confidence = "Confidence: " + parts[1]
-                    priority_part, body_part = body.split("]: ", 1)
-                    styled_rec = (
-                        f'<span class="priority-label">{priority_part}]:</span> '
-                        f'{body_part} - <span class="confidence-level">{confidence}</span>'
-                    )
-                else:
-                    styled_rec = rec
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown(f'<div class="{card_class}">{styled_rec}</div>', unsafe_allow_html=True)
-                with col2:
-                    if st.button("Flag This", key=f"loc_{rec[:50]}"):
-                        log_feedback("Location Analysis", rec, "User flagged as inconsistent")
-                        st.success("Feedback logged.")
-
-    with st.expander("Slope Analysis"):
-        if report.slope_analysis and isinstance(report.slope_analysis, SlopeAnalysis):
-            st.write("**Summary:**", report.slope_analysis.summary)
-            if report.slope_analysis.recommendations:
-                st.write("**Recommendations:**")
-                for rec in report.slope_analysis.recommendations:
-                    priority = rec.split("]:")[0][1:].lower()
-                    card_class = f"{priority}-card"
-                    parts = rec.split(" - Confidence: ")
-                    if len(parts) == 2:
-                        body = parts[0]
-                        confidence = "Confidence: " + parts[1]
-                        priority_part, body_part = body.split("]: ", 1)
-                        styled_rec = (
-                            f'<span class="priority-label">{priority_part}]:</span> '
-                            f'{body_part} - <span class="confidence-level">{confidence}</span>'
-                        )
-                    else:
-                        styled_rec = rec
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.markdown(f'<div class="{card_class}">{styled_rec}</div>', unsafe_allow_html=True)
-                    with col2:
-                        if st.button("Flag This", key=f"slope_{rec[:50]}"):
-                            log_feedback("Slope Analysis", rec, "User flagged as inconsistent")
-                            st.success("Feedback logged.")
-        else:
-            st.write("**Summary:**", "Slope analysis unavailable or failed.")
-
-    with st.expander("Detailed Recommendations"):
-        if hasattr(report, "detailed_recommendations"):
-            for rec in report.detailed_recommendations:
-                priority = rec.split("]:")[0][1:].lower()
-                card_class = f"{priority}-card"
-                parts = rec.split(" - Confidence: ")
-                if len(parts) == 2:
-                    body = parts[0]
-                    confidence = "Confidence: " + parts[1]
-                    priority_part, body_part = body.split("]: ", 1)
-                    styled_rec = (
-                        f'<span class="priority-label">{priority_part}]:</span> '
-                        f'{body_part} - <span class="confidence-level">{confidence}</span>'
-                    )
-                else:
-                    styled_rec = rec
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown(f'<div class="{card_class}">{styled_rec}</div>', unsafe_allow_html=True)
-                with col2:
-                    if st.button("Flag This", key=f"detail_{rec[:50]}"):
-                        log_feedback("Detailed Recommendations", rec, "User flagged as inconsistent")
-                        st.success("Feedback logged.")
-        else:
-            st.write("No detailed recommendations available.")
-
-    with st.expander("Verification Needed"):
-        if hasattr(report, "verification_needed") and report.verification_needed:
-            st.write("**Additional Data Required:**")
-            for item in report.verification_needed:
-                st.markdown(f"- {item}")
-        else:
-            st.write("No additional verification required based on current data.")
+    slots = {section: st.empty() for section in REPORT_SECTIONS}
+    with slots["lake_proximity"].container():
+        render_lake_proximity()
+    with slots["slope_distribution"].container():
+        render_slope_distribution()
+    request = st.session_state.report_request
+    if request is not None:
+        report = stream_report(request, slots)
+        if report is None:
+            st.error("Failed to generate the feasibility report. Please re-run the analysis.")
+            return
+    else:
+        for section in FeasibilityReport.model_fields:
+            render_section(slots[section], section, getattr(report, section))
+    with slots["feasibility_warning"].container():
+        render_feasibility_warning(report)
 
 def main():
+    load_layer_registry()
     st.title("Geotechnical Engineering Feasibility Assistant - Mercer Island, WA")
 
     # Initialize session state variables if they don’t exist
@@ -456,10 +602,12 @@ def main():
         "address",
         "property",
         "slope_data",
+        "slope_distribution",
         "environmental_check",
         "location_analysis",
         "slope_analysis",
         "feasibility_report",
+        "report_request",
         "chat_history",
         "street_input",
         "zip_input",
@@ -475,31 +623,69 @@ def main():
         st.markdown(
             """
         **How to Use This App:**
-        1. Enter a Mercer Island street address (e.g., "1925 82nd Ave SE") and optional ZIP code.
+        1. Enter a Mercer Island street address (e.g., "1925 82nd Ave SE") and optional ZIP code,
+           a parcel PIN, or pick the parcel on the map.
         2. Click "Analyze Property" to generate a feasibility report with slope, hazard, and location insights.
         3. View results in the "Analysis" tab—expand sections for details and use "Flag This" to report issues.
         4. Ask questions about your report in the "Chat" tab.
         """
         )
-        street = st.text_input(
-            "Street Address",
-            value=st.session_state.street_input,
-            placeholder="e.g., 1234 Main St",
-            key="street",
-        )
-        zip_code = st.text_input(
-            "ZIP Code (optional)",
-            value=st.session_state.zip_input,
-            placeholder="e.g., 98040",
-            key="zip",
-        )
-        analyze_button = st.button("Analyze Property")
+        lookup_mode = st.radio("Find the parcel by", ["Address", "Parcel PIN", "Map click"], horizontal=True)
+
+        if lookup_mode == "Address":
+            # The widget's state is the only source of its value; street_input just carries it
+            # across runs where the widget is not shown (another lookup mode was picked)
+            if "street" not in st.session_state:
+                st.session_state.street = st.session_state.street_input
+            street = st.text_input("Street Address", placeholder="e.g., 1234 Main St", key="street")
+            # text_input reruns on Enter or when it loses focus, so suggestions follow each submitted entry
+            local_geocoder = get_local_geocoder()
+            # Without imported address points there is nothing to suggest or check against
+            if street and len(local_geocoder):
+                suggestions = local_geocoder.suggest(street)
+                # Only full addresses are offered for picking; a bare street name would not geocode
+                addresses = [suggestion for suggestion in suggestions if house_number(normalize_street(suggestion))]
+                streets = [suggestion for suggestion in suggestions if suggestion not in addresses]
+                if addresses and addresses != [street]:
+                    st.selectbox(
+                        "Known addresses",
+                        addresses,
+                        index=None,
+                        placeholder="Pick a matching address",
+                        key="street_suggestion",
+                        on_change=use_suggestion,
+                    )
+                elif streets:
+                    st.caption(f"Known streets: {', '.join(streets[:5])}. Add the house number to see addresses.")
+                elif local_geocoder.geocode(Address(street=street)) is None:
+                    st.caption("Not a known Mercer Island address; it will be looked up online.")
+            zip_code = st.text_input(
+                "ZIP Code (optional)",
+                value=st.session_state.zip_input,
+                placeholder="e.g., 98040",
+                key="zip",
+            )
+            analyze_button = st.button("Analyze Property")
 
-        st.session_state.street_input = street
-        st.session_state.zip_input = zip_code
+            st.session_state.street_input = street
+            st.session_state.zip_input = zip_code
 
-        if analyze_button and street:
-            perform_analysis(street, zip_code)
+            if analyze_button and street:
+                perform_analysis(street, zip_code)
+        elif lookup_mode == "Parcel PIN":
+            pin = st.text_input("Parcel PIN", placeholder="e.g., 3622500126", key="pin")
+            if st.button("Analyze Property") and pin:
+                perform_pin_analysis(pin)
+        else:
+            picker = folium.Map(location=MERCER_ISLAND_CENTER, zoom_start=13)
+            clicked = st_folium(
+                picker, height=300, use_container_width=True, returned_objects=["last_clicked"], key="parcel_picker"
+            )
+            last_clicked = (clicked or {}).get("last_clicked")
+            if last_clicked:
+                st.caption(f"Selected point: ({last_clicked['lat']:.6f}, {last_clicked['lng']:.6f})")
+            if st.button("Analyze Property", disabled=not last_clicked):
+                perform_click_analysis(last_clicked["lat"], last_clicked["lng"])
 
     analysis_tab, chat_tab = st.tabs(["Analysis", "Chat"])
 
@@ -0,0 +1,158 @@
+"""Asynchronous batch geocoding for bulk jobs.
+
+Addresses stream in from an async iterable and (address, coordinates) pairs stream
+out in the same order. Each address is resolved like `geocode_address`: the local
+address index first, then the shared geocode cache, then Nominatim. Provider calls
+pass through a token bucket that holds them to the usage policy, and identical
+addresses already in flight share a single provider call.
+
+geopy's async adapter needs aiohttp, which is not a dependency, so provider calls run
+the synchronous geocoder on worker threads; the token bucket still spaces them out.
+Cache reads and writes run on worker threads too, so a busy database never stalls the
+event loop.
+
+The bucket only paces this process: it does not share the app's `nominatim_geocode`
+limiter, and the two together would exceed the usage policy's 1 request per second.
+Run batch jobs while no app process is geocoding against Nominatim.
+
+Usage: ``python batch_geocoder.py <file with one street address per line>``
+"""
+import sys
+import time
+import asyncio
+import logging
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+from geo_processing import geolocator, get_local_geocoder
+from geocode_cache import geocode_cache, normalize_address
+from models import Address, Coordinates
+
+NOMINATIM_RATE = 1.0  # Requests per second allowed by Nominatim's usage policy
+NOMINATIM_BURST = 1  # Requests that may be sent back to back after an idle spell
+MAX_PENDING = 32  # Addresses resolved ahead of the one being yielded
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class BatchGeocoder:
+    """Rate-limited, coalescing geocoder for many addresses."""
+
+    def __init__(self, geocode: Optional[Callable] = None, rate: float = NOMINATIM_RATE,
+                 burst: int = NOMINATIM_BURST, max_pending: int = MAX_PENDING):
+        self._geocode = geocode or geolocator.geocode
+        self._bucket = TokenBucket(rate, burst)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}  # Callers awaiting each in-flight lookup
+        self.max_pending = max_pending
+        self.provider_calls = 0
+
+    async def _lookup(self, query: str, cache_key: str) -> Optional[Coordinates]:
+        await self._bucket.acquire()
+        self.provider_calls += 1
+        try:
+            location = await asyncio.to_thread(self._geocode, query)
+        except (GeocoderTimedOut, GeocoderServiceError) as e:
+            logging.error(f"Geocoding error for {query}: {e}")
+            return None
+        coordinates = Coordinates(latitude=location.latitude, longitude=location.longitude) if location else None
+        await asyncio.to_thread(geocode_cache.put, cache_key, coordinates)
+        return coordinates
+
+    def _finish(self, cache_key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(cache_key, None)
+        self._waiters.pop(cache_key, None)
+        # Waiters get the exception from `await`; retrieving it here keeps a lookup whose
+        # waiters were all cancelled from logging "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def geocode(self, address: Address) -> Optional[Coordinates]:
+        """Resolve one address, or None if it cannot be found."""
+        coordinates = get_local_geocoder().geocode(address)
+        if coordinates is not None:
+            return coordinates
+        cache_key = normalize_address(address.full_address())
+        cached = await asyncio.to_thread(geocode_cache.get, cache_key)
+        if cached is not None:
+            return cached[1]
+        task = self._in_flight.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._lookup(address.full_address(), cache_key))
+            self._in_flight[cache_key] = task
+            self._waiters[cache_key] = 0
+            task.add_done_callback(lambda done: self._finish(cache_key, done))
+        self._waiters[cache_key] += 1
+        try:
+            # shield so one cancelled caller does not cancel the lookup others are waiting on
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._in_flight.get(cache_key) is task and self._waiters[cache_key] == 1:
+                task.cancel()  # Nobody else wants this lookup
+            raise
+        finally:
+            # The entry may already belong to a newer lookup of the same address
+            if self._in_flight.get(cache_key) is task:
+                self._waiters[cache_key] -= 1
+
+    async def geocode_stream(self, addresses: AsyncIterable[Address]) -> AsyncIterator[Tuple[Address, Optional[Coordinates]]]:
+        """Yield (address, coordinates or None) for every address, in input order."""
+        pending = asyncio.Queue(self.max_pending)
+
+        async def produce() -> None:
+            async for address in addresses:
+                await pending.put((address, asyncio.create_task(self.geocode(address))))
+            await pending.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (item := await pending.get()) is not None:
+                address, task = item
+                yield address, await task
+            await producer
+        finally:
+            producer.cancel()
+            # Lookups queued behind an early stop or a failure would otherwise run unobserved
+            while not pending.empty():
+                item = pending.get_nowait()
+                if item is not None:
+                    item[1].cancel()
+
+async def _read_addresses(path: str) -> AsyncIterator[Address]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield Address(street=line.strip())
+
+async def _main(path: str) -> None:
+    geocoder = BatchGeocoder()
+    async for address, coordinates in geocoder.geocode_stream(_read_addresses(path)):
+        location = f"{coordinates.latitude},{coordinates.longitude}" if coordinates else ","
+        print(f"{address.street}\t{location}")
+    logging.info(f"Made {geocoder.provider_calls} provider calls; cache counters: {geocode_cache.metrics()}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 2:
+        raise SystemExit(__doc__)
+    asyncio.run(_main(sys.argv[1]))
@@ -0,0 +1,296 @@
+"""Gridded elevation model interpolated from the 10 ft Lidar contours.
+
+The contour vertices are burned into a regular EPSG:32610 grid and the cells between
+contours are filled by harmonic (Laplace) interpolation, solved coarse-to-fine with
+red-black SOR so the whole island converges in well under a minute with NumPy alone.
+The grid is stored as a .npy file that is memory-mapped at load time, next to a JSON
+sidecar with its affine transform.
+
+The contour elevations are in feet; they are converted to meters when the grid is
+built so rise and run share a unit and cell slopes are true angles.
+
+When the contours change, the rebuilt grid is compared with the previous one and the
+tiles whose elevations moved are recorded, so parcel tables derived from the DEM only
+recompute the parcels in them.
+
+Run ``python dem.py`` to build the grid ahead of deployment.
+"""
+import os
+import json
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import shapely
+
+from layer_store import STORE_DIR, PROJECTED_CRS, atomic_write, ensure_layer, read_layer, write_json
+
+DEM_RESOLUTION = 2.0  # Cell size in meters
+# Bump when the stored grid changes meaning so existing grids are rebuilt (2: elevations in meters)
+DEM_VERSION = 2
+CONTOUR_ELEVATION_TO_METERS = 0.3048  # The Lidar contour elevations are in feet
+DEM_PADDING = 50.0  # Meters of grid kept around the outermost contours
+# Fixed histogram bin edges in degrees; 15/25/40 are the slope class boundaries
+SLOPE_HISTOGRAM_BINS = (0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 90)
+SLOPE_THRESHOLDS = (15, 25, 40)
+DEM_CHANGE_TOLERANCE = 0.01  # Elevation difference below which a rebuilt cell counts as unchanged
+DEM_CHANGE_TILE = 128  # Cells per side of the tiles in which grid changes are recorded
+
+def dem_paths(resolution: float = DEM_RESOLUTION):
+    """Return the (.npy grid, .json transform) paths for a DEM resolution."""
+    stem = os.path.join(STORE_DIR, f"dem.v{DEM_VERSION}.{resolution:g}m")
+    return f"{stem}.npy", f"{stem}.json"
+
+def _coarsen(values: np.ndarray, known: np.ndarray):
+    rows, cols = values.shape
+    total = np.where(known, values, 0.0).reshape(rows // 2, 2, cols // 2, 2).sum(axis=(1, 3))
+    count = known.reshape(rows // 2, 2, cols // 2, 2).sum(axis=(1, 3))
+    return total / np.maximum(count, 1), count > 0
+
+def _relax(z: np.ndarray, known: np.ndarray, iterations: int, omega: float = 1.8) -> np.ndarray:
+    # Red-black SOR sweeps of the 4-neighbour Laplacian; edge padding gives a zero-gradient border
+    rows, cols = z.shape
+    red = (np.add.outer(np.arange(rows), np.arange(cols)) % 2 == 0) & ~known
+    black = ~red & ~known
+    z = z.copy()
+    for _ in range(iterations):
+        for color in (red, black):
+            padded = np.pad(z, 1, mode="edge")
+            average = 0.25 * (padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:])
+            z[color] += omega * (average[color] - z[color])
+    return z
+
+def harmonic_fill(values: np.ndarray, known: np.ndarray, min_size: int = 32,
+                  coarse_iterations: int = 500, fine_iterations: int = 30) -> np.ndarray:
+    """Fill the unknown cells of a grid with the harmonic interpolant of the known ones.
+
+    Both dimensions must be divisible by 2 as many times as the grid is coarsened.
+    """
+    if min(values.shape) < 2 * min_size or values.shape[0] % 2 or values.shape[1] % 2:
+        z = np.where(known, values, values[known].mean())
+        return _relax(z, known, coarse_iterations)
+    # Coarser levels are 4x cheaper per sweep, so they can afford twice as many
+    coarse = harmonic_fill(*_coarsen(values, known), min_size, coarse_iterations, 2 * fine_iterations)
+    z = np.repeat(np.repeat(coarse, 2, axis=0), 2, axis=1)
+    np.copyto(z, values, where=known)
+    return _relax(z, known, fine_iterations)
+
+class DemGrid:
+    """North-up elevation grid with an affine transform (origin at the top-left corner)."""
+
+    def __init__(self, elevations: np.ndarray, x0: float, y0: float, resolution: float):
+        self.elevations = elevations
+        self.x0 = x0
+        self.y0 = y0
+        self.resolution = resolution
+
+    @classmethod
+    def from_contours(cls, lines, elevations, resolution: float = DEM_RESOLUTION,
+                      padding: float = DEM_PADDING) -> "DemGrid":
+        """Interpolate a grid from projected contour lines and their elevations in meters."""
+        lines = shapely.segmentize(np.asarray(lines, dtype=object), resolution / 2)
+        coords, line_idx = shapely.get_coordinates(lines, return_index=True)
+        vertex_elevations = np.asarray(elevations, dtype=float)[line_idx]
+        # Pad the extent to a multiple of 2**levels so every coarsening step halves evenly
+        block = resolution * 2 ** 8
+        xmin, ymin = coords.min(axis=0) - padding
+        xmax, ymax = coords.max(axis=0) + padding
+        cols = int(np.ceil((xmax - xmin) / block)) * 2 ** 8
+        rows = int(np.ceil((ymax - ymin) / block)) * 2 ** 8
+        x0, y0 = xmin, ymin + rows * resolution
+        col = ((coords[:, 0] - x0) / resolution).astype(np.intp)
+        row = ((y0 - coords[:, 1]) / resolution).astype(np.intp)
+        cell = row * cols + col
+        total = np.bincount(cell, weights=vertex_elevations, minlength=rows * cols)
+        count = np.bincount(cell, minlength=rows * cols)
+        known = (count > 0).reshape(rows, cols)
+        values = (total / np.maximum(count, 1)).reshape(rows, cols)
+        grid = harmonic_fill(values, known).astype(np.float32)
+        return cls(grid, x0, y0, resolution)
+
+    def save(self, grid_path: str, transform_path: str, **metadata) -> None:
+        """Write the grid as .npy and its transform as JSON, atomically."""
+        os.makedirs(os.path.dirname(grid_path), exist_ok=True)
+        # np.save appends .npy to any other name
+        atomic_write(grid_path, lambda tmp_path: np.save(tmp_path, self.elevations), suffix=".tmp.npy")
+        transform = {
+            "x0": self.x0, "y0": self.y0, "resolution": self.resolution,
+            "shape": list(self.elevations.shape), "crs": PROJECTED_CRS, **metadata,
+        }
+        write_json(transform_path, transform)
+
+    @classmethod
+    def load(cls, grid_path: str, transform_path: str) -> "DemGrid":
+        """Memory-map a saved grid."""
+        with open(transform_path) as f:
+            transform = json.load(f)
+        elevations = np.load(grid_path, mmap_mode="r")
+        return cls(elevations, transform["x0"], transform["y0"], transform["resolution"])
+
+    def _slope_window(self, geometry):
+        # Slope grid over the geometry's window plus a one-cell margin, so cells on the
+        # parcel edge get centered differences too
+        rows, cols = self.elevations.shape
+        xmin, ymin, xmax, ymax = shapely.bounds(geometry)
+        c0 = max(int((xmin - self.x0) / self.resolution) - 1, 0)
+        c1 = min(int((xmax - self.x0) / self.resolution) + 2, cols)
+        r0 = max(int((self.y0 - ymax) / self.resolution) - 1, 0)
+        r1 = min(int((self.y0 - ymin) / self.resolution) + 2, rows)
+        if r1 - r0 < 2 or c1 - c0 < 2:
+            return None, None, None, None
+        window = np.asarray(self.elevations[r0:r1, c0:c1], dtype=float)
+        dz_drow, dz_dcol = np.gradient(window, self.resolution)
+        slopes = np.degrees(np.arctan(np.hypot(dz_drow, dz_dcol)))
+        xs = self.x0 + np.arange(c0, c1) * self.resolution
+        ys = self.y0 - np.arange(r0, r1) * self.resolution
+        # Top-left corner of every cell in the window
+        return window, slopes, *np.meshgrid(xs, ys)
+
+    def weighted_cells(self, geometry) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the elevation and slope of every cell touching a projected geometry and the fraction of it inside."""
+        elevations, slopes, x, y = self._slope_window(geometry)
+        if slopes is None:
+            return np.empty(0), np.empty(0), np.empty(0)
+        cells = shapely.box(x, y - self.resolution, x + self.resolution, y)
+        shapely.prepare(geometry)
+        weights = shapely.contains_properly(geometry, cells).astype(float)
+        edge = (weights == 0) & shapely.intersects(geometry, cells)
+        weights[edge] = shapely.area(shapely.intersection(cells[edge], geometry)) / self.resolution ** 2
+        touched = weights > 0
+        return elevations[touched], slopes[touched], weights[touched]
+
+    def slope_summary(self, geometry) -> Optional[Dict]:
+        """Return the area-weighted mean slope, the maximum slope and the elevation difference over a projected geometry.
+
+        The maximum and the elevation difference only count cells at least half inside
+        the geometry (or the most covered cell of one smaller than a cell), so a steep
+        neighbour clipped at the boundary does not set them. None outside the grid.
+        """
+        elevations, slopes, weights = self.weighted_cells(geometry)
+        if len(slopes) == 0:
+            return None
+        inside = weights >= 0.5
+        if not inside.any():
+            inside = weights == weights.max()
+        return {
+            "average_slope": float(np.average(slopes, weights=weights)),
+            "max_slope": float(slopes[inside].max()),
+            "elevation_difference": float(np.ptp(elevations[inside])),
+        }
+
+    def slope_distribution(self, geometry, bins: Iterable[float] = SLOPE_HISTOGRAM_BINS) -> Optional[Dict]:
+        """Return the area-weighted slope distribution over a projected geometry, or None outside the grid.
+
+        Percentiles, threshold fractions and the histogram all weigh each cell by the share
+        of its area inside the geometry.
+        """
+        _, slopes, weights = self.weighted_cells(geometry)
+        if len(slopes) == 0:
+            return None
+        bins = tuple(bins)
+        order = np.argsort(slopes)
+        sorted_slopes, sorted_weights = slopes[order], weights[order]
+        cumulative = np.cumsum(sorted_weights)
+        total = cumulative[-1]
+        p50, p90, p99 = np.interp(np.array([0.5, 0.9, 0.99]) * total, cumulative - sorted_weights / 2, sorted_slopes)
+        histogram = np.histogram(slopes, bins=bins, weights=weights)[0] / total
+        return {
+            "p50_slope": float(p50),
+            "p90_slope": float(p90),
+            "p99_slope": float(p99),
+            **{f"fraction_above_{t}": float(weights[slopes > t].sum() / total) for t in SLOPE_THRESHOLDS},
+            "histogram_bins": [float(b) for b in bins],
+            "histogram": histogram.tolist(),
+        }
+
+def pack_distribution(distribution: Dict) -> Dict[str, int]:
+    """Quantize a slope distribution for the island-wide table.
+
+    Percentiles are kept in tenths of a degree and histogram bins in per-mille of parcel
+    area, all as uint16. Threshold fractions are recovered from the histogram because the
+    thresholds are bin edges.
+    """
+    packed = {f"p{q}": round(distribution[f"p{q}_slope"] * 10) for q in (50, 90, 99)}
+    packed.update({f"h{i}": round(share * 1000) for i, share in enumerate(distribution["histogram"])})
+    return packed
+
+def unpack_distribution(packed: Dict[str, int], bins: Iterable[float] = SLOPE_HISTOGRAM_BINS) -> Dict:
+    """Expand a row written by `pack_distribution` back into a slope distribution."""
+    bins = tuple(bins)
+    histogram = [packed[f"h{i}"] / 1000 for i in range(len(bins) - 1)]
+    return {
+        **{f"p{q}_slope": packed[f"p{q}"] / 10 for q in (50, 90, 99)},
+        **{f"fraction_above_{t}": sum(histogram[bins.index(t):]) for t in SLOPE_THRESHOLDS},
+        "histogram_bins": [float(b) for b in bins],
+        "histogram": histogram,
+    }
+
+def changed_tiles(old: DemGrid, new: DemGrid, tolerance: float = DEM_CHANGE_TOLERANCE,
+                  tile: int = DEM_CHANGE_TILE) -> Optional[np.ndarray]:
+    """Return the (n, 4) projected bounds of the tiles where two grids differ, or None if they are not aligned."""
+    if (old.elevations.shape != new.elevations.shape or (old.x0, old.y0, old.resolution) != (new.x0, new.y0, new.resolution)):
+        return None
+    rows, cols = np.nonzero(np.abs(np.asarray(old.elevations) - new.elevations) > tolerance)
+    tiles = np.unique(np.column_stack([rows // tile, cols // tile]), axis=0)
+    size = tile * new.resolution
+    minx = new.x0 + tiles[:, 1] * size
+    maxy = new.y0 - tiles[:, 0] * size
+    return np.column_stack([minx, maxy - size, minx + size, maxy])
+
+def read_changes(from_hash: str, resolution: float = DEM_RESOLUTION) -> Optional[np.ndarray]:
+    """Return the bounds of the grid tiles changed since the DEM built from contours `from_hash`.
+
+    Returns None when the last rebuild did not start from `from_hash`.
+    """
+    try:
+        with open(dem_paths(resolution)[1]) as f:
+            transform = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if transform.get("source_sha256") == from_hash:
+        return np.empty((0, 4))
+    changes = transform.get("changes")
+    if changes is None or changes["from"] != from_hash:
+        return None
+    return np.array(changes["bounds"], dtype=float).reshape(-1, 4)
+
+def build_dem(contour_file: str, resolution: float = DEM_RESOLUTION) -> DemGrid:
+    """Interpolate the DEM from a contour layer and store it, recording where it changed."""
+    entry = ensure_layer(contour_file)
+    contours = read_layer(contour_file, PROJECTED_CRS)
+    elevations = contours["Elevation"].to_numpy(dtype=float) * CONTOUR_ELEVATION_TO_METERS
+    dem = DemGrid.from_contours(contours.geometry.to_numpy(), elevations, resolution)
+    grid_path, transform_path = dem_paths(resolution)
+    metadata = {"source_sha256": entry["sha256"], "version": DEM_VERSION, "vertical_unit": "m"}
+    try:
+        with open(transform_path) as f:
+            previous_hash = json.load(f).get("source_sha256")
+        bounds = changed_tiles(DemGrid.load(grid_path, transform_path), dem)
+        if previous_hash not in (None, entry["sha256"]) and bounds is not None:
+            metadata["changes"] = {"from": previous_hash, "bounds": bounds.tolist()}
+            logging.info(f"DEM changed in {len(bounds)} tiles since the previous build.")
+    except (OSError, ValueError) as e:
+        logging.info(f"No previous DEM to compare against: {e}")
+    dem.save(grid_path, transform_path, **metadata)
+    logging.info(f"Built {resolution:g} m DEM {dem.elevations.shape} from {contour_file}")
+    return dem
+
+def load_dem(contour_file: str, resolution: float = DEM_RESOLUTION) -> DemGrid:
+    """Memory-map the stored DEM, rebuilding it if it is missing or its contours changed."""
+    grid_path, transform_path = dem_paths(resolution)
+    entry = ensure_layer(contour_file)
+    try:
+        with open(transform_path) as f:
+            current = json.load(f).get("source_sha256") == entry["sha256"]
+    except (OSError, ValueError):
+        current = False
+    if not current or not os.path.exists(grid_path):
+        logging.info(f"DEM for {contour_file} is missing or stale; rebuilding.")
+        build_dem(contour_file, resolution)
+    return DemGrid.load(grid_path, transform_path)
+
+if __name__ == "__main__":
+    from geo_processing import CONTOUR_FILE
+
+    logging.basicConfig(level=logging.INFO)
+    build_dem(CONTOUR_FILE)
@@ -1,13 +1,15 @@
 import os
 import logging
 import json
-import numpy as np
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, List, Tuple, Type
 
 from dotenv import load_dotenv
 import google.generativeai as genai
+from pydantic import BaseModel
 
-from models import LocationAnalysis, SlopeAnalysis, FeasibilityReport, SlopeData
+from llm_cache import response_cache, response_key
+from models import LocationAnalysis, SlopeAnalysis, FeasibilityReport, SlopeData, SlopeDistribution
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,14 +17,10 @@ logging.basicConfig(level=logging.INFO)
 # Load environment variables
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-# Initialize Gemini model
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel("gemini-2.0-flash-exp")
-else:
-    logging.warning("GOOGLE_API_KEY not found. Gemini model not initialized.")
-    model = None
+MODEL_NAME = "gemini-2.0-flash-exp"
+GENERATION_CONFIG = {}  # Part of every response cache key
+REPORT = "report"  # Field name under which stream_feasibility_report yields the finished report
+PROMPT_VERSION = 6  # Bump when any prompt template changes so cached parcel reports are regenerated
 
 # Define the enhanced system prompt (unchanged)
 SYSTEM_PROMPT = """
@@ -63,36 +61,164 @@ of regional experience.
   earthquake—more tests needed').
 """
 
+# Initialize Gemini model; the system prompt is sent as the system instruction, not pasted into each prompt
+if GOOGLE_API_KEY:
+    genai.configure(api_key=GOOGLE_API_KEY)
+    model = genai.GenerativeModel(MODEL_NAME, generation_config=GENERATION_CONFIG, system_instruction=SYSTEM_PROMPT)
+else:
+    logging.warning("GOOGLE_API_KEY not found. Gemini model not initialized.")
+    model = None
+
+# Answer format for chat, sent after the report and the question
+CHAT_INSTRUCTIONS = """INSTRUCTIONS:
+Detect expertise: technical queries (e.g., 'What's FOS?') get detailed terms; layperson (e.g., 'Is it safe?') get plain language + terms explained.
+Reference report specifics (e.g., 'Your 29.69° slope exceeds till repose').
+Suggest practical next steps (e.g., 'Engage a geotech for borings').
+Output structured JSON with the following format, even for narrative responses:
+```json
+{
+  "response": {
+    "introduction": "Brief intro to the response explaining its context",
+    "sections": [
+      {
+        "title": "Section title (e.g., Deep Foundations)",
+        "rationale": "Technical explanation of why this is a concern or solution",
+        "recommendation": "[Priority]: Text (cost level cost) - Confidence: Level",
+        "plain_language": "Simplified explanation for non-technical users",
+        "next_steps": "Actionable steps to address this"
+      }
+    ],
+    "verification_needs": ["List of items needing verification"]
+  }
+}
+Example for 'foundation recommendations':
+{
+  "response": {
+    "introduction": "Here's more detail on the foundation recommendations based on the report's geotechnical concerns.",
+    "sections": [
+      {
+        "title": "Deep Foundations (Piles or Caissons)",
+        "rationale": "Unstable surface soils near the lake may not support a structure...",
+        "recommendation": "[Critical]: Implement deep foundations (high cost) - Confidence: Medium",
+        "plain_language": "We suggest a deep foundation to keep your house stable on soft ground.",
+        "next_steps": "Hire a geotechnical engineer for borings."
+      }
+    ],
+    "verification_needs": ["Soil bearing capacity"]
+  }
+}
+Add: 'If this response seems inaccurate, please flag it for review' to the end of the introduction.
+"""
+
+def prompt_version() -> str:
+    """Return the identifier of the current model and prompts, recorded with every cached parcel report."""
+    return f"{MODEL_NAME}:v{PROMPT_VERSION}"
+
+def normalize_priorities(recommendations: List[str]) -> List[str]:
+    """Map the [High]/[Medium] priority labels the model sometimes uses onto [Critical]/[Major]."""
+    normalized = []
+    for rec in recommendations:
+        if rec.startswith("[High]"):
+            rec = rec.replace("[High]", "[Critical]")
+        elif rec.startswith("[Medium]"):
+            rec = rec.replace("[Medium]", "[Major]")
+        normalized.append(rec)
+    return normalized
+
+def normalize_response(response_data: dict) -> dict:
+    """Normalize recommendation priorities in a parsed response, including nested analyses."""
+    for section in ["recommendations", "detailed_recommendations"]:
+        if section in response_data:
+            response_data[section] = normalize_priorities(response_data[section])
+    for analysis in ["location_analysis", "slope_analysis"]:
+        if isinstance(response_data.get(analysis), dict) and "recommendations" in response_data[analysis]:
+            response_data[analysis]["recommendations"] = normalize_priorities(response_data[analysis]["recommendations"])
+    return response_data
+
 def parse_gemini_json_response(response_text: str) -> dict:
     """Parse the JSON response from the Gemini model, normalizing priority levels."""
     response_text = response_text.strip()
     if response_text.startswith("```json") and response_text.endswith("```"):
         json_str = response_text[len("```json"):].rsplit("```", 1)[0].strip()
-        response_data = json.loads(json_str)
-        # Normalize recommendation priorities
-        for section in ["recommendations", "detailed_recommendations"]:
-            if section in response_data:
-                for i, rec in enumerate(response_data[section]):
-                    if rec.startswith("[High]"):
-                        response_data[section][i] = rec.replace("[High]", "[Critical]")
-                    elif rec.startswith("[Medium]"):
-                        response_data[section][i] = rec.replace("[Medium]", "[Major]")
-        if "location_analysis" in response_data and "recommendations" in response_data["location_analysis"]:
-            for i, rec in enumerate(response_data["location_analysis"]["recommendations"]):
-                if rec.startswith("[High]"):
-                    response_data["location_analysis"]["recommendations"][i] = rec.replace("[High]", "[Critical]")
-                elif rec.startswith("[Medium]"):
-                    response_data["location_analysis"]["recommendations"][i] = rec.replace("[Medium]", "[Major]")
-        if "slope_analysis" in response_data and "recommendations" in response_data["slope_analysis"]:
-            for i, rec in enumerate(response_data["slope_analysis"]["recommendations"]):
-                if rec.startswith("[High]"):
-                    response_data["slope_analysis"]["recommendations"][i] = rec.replace("[High]", "[Critical]")
-                elif rec.startswith("[Medium]"):
-                    response_data["slope_analysis"]["recommendations"][i] = rec.replace("[Medium]", "[Major]")
-        return response_data
+        return normalize_response(json.loads(json_str))
     else:
         raise ValueError(f"Response is not in expected JSON format: {response_text}")
 
+class JsonFieldStream:
+    """Incremental parser for a JSON object arriving in chunks.
+
+    `feed` returns the (key, value) pairs of the top-level fields whose values became
+    complete with that chunk. A value counts as complete once the text after it has
+    started, so a number is never cut short. Anything before the opening brace (such
+    as a code fence) is skipped.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos: Optional[int] = None  # Where the next top-level key starts
+        self._decoder = json.JSONDecoder()
+
+    def _skip(self, pos: int, chars: str = " \t\r\n") -> int:
+        while pos < len(self._text) and self._text[pos] in chars:
+            pos += 1
+        return pos
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        self._text += chunk
+        if self._pos is None:
+            start = self._text.find("{")
+            if start < 0:
+                return []
+            self._pos = start + 1
+        fields = []
+        while True:
+            pos = self._skip(self._pos, " \t\r\n,")
+            if pos >= len(self._text) or self._text[pos] == "}":
+                return fields
+            try:
+                key, pos = self._decoder.raw_decode(self._text, pos)
+                pos = self._skip(pos)
+                if pos >= len(self._text) or self._text[pos] != ":":
+                    return fields
+                value, end = self._decoder.raw_decode(self._text, self._skip(pos + 1))
+            except json.JSONDecodeError:
+                return fields  # The key or value is still arriving
+            end = self._skip(end)
+            if end >= len(self._text):
+                return fields  # Parsed again once the next chunk shows the value ended
+            fields.append((key, value))
+            self._pos = end
+
+def generate(prompt: str, response_model: Optional[Type[BaseModel]] = None) -> Tuple[str, Optional[BaseModel]]:
+    """Return (raw text, validated `response_model` or None) for a prompt, answering repeated prompts from the response cache.
+
+    A response is cached only once it parsed and validated, so a malformed answer is
+    not served again.
+    """
+    key = response_key(MODEL_NAME, prompt, GENERATION_CONFIG, SYSTEM_PROMPT)
+    cached = response_cache.get(key)
+    if cached is not None:
+        logging.debug(f"Gemini response cache hit for {key[:12]}")
+        response_text, parsed = cached
+        return response_text, response_model(**parsed) if response_model is not None else None
+    response = model.generate_content(prompt)
+    parsed, result = None, None
+    if response_model is not None:
+        parsed = parse_gemini_json_response(response.text)
+        result = response_model(**parsed)
+    response_cache.put(key, response.text, parsed)
+    return response.text, result
+
+def describe_slope_distribution(distribution: Optional[SlopeDistribution]) -> str:
+    """Summarize a parcel's DEM slope distribution in one prompt line."""
+    if distribution is None:
+        return "Not available"
+    return (
+        f"median {distribution.p50_slope:.1f}°, p90 {distribution.p90_slope:.1f}°, p99 {distribution.p99_slope:.1f}°; "
+        f"{distribution.fraction_above_15:.0%} of the area steeper than 15°, "
+        f"{distribution.fraction_above_25:.0%} steeper than 25°, {distribution.fraction_above_40:.0%} steeper than 40°"
+    )
+
 def analyze_location(
     latitude: float, longitude: float, address: str, hazards: dict, lake_proximity: bool
 ) -> Optional[LocationAnalysis]:
@@ -102,8 +228,6 @@ def analyze_location(
         return None
 
     prompt = f"""
-{SYSTEM_PROMPT}
-
 TASK: Analyze property location at latitude {latitude}, longitude {longitude}, address '{address}'
 
 KEY DATA SUMMARY:
@@ -134,30 +258,31 @@ INSTRUCTIONS:
 """
     try:
         logging.debug(f"Location Analysis Prompt: {prompt}")
-        response = model.generate_content(prompt)
-        logging.debug(f"Location Analysis Response: {response.text}")
-        response_data = parse_gemini_json_response(response.text)
-        return LocationAnalysis(**response_data)
+        response_text, location_analysis = generate(prompt, LocationAnalysis)
+        logging.debug(f"Location Analysis Response: {response_text}")
+        return location_analysis
     except Exception as e:
         logging.error(f"Error in analyze_location: {e}")
         return None
 
 def analyze_slope(
-    slope: float, elevation_diff: float, distance: float, lake_proximity: bool
+    slope: float, max_slope: float, elevation_diff: float, lake_proximity: bool,
+    slope_distribution: Optional[SlopeDistribution] = None,
 ) -> Optional[SlopeAnalysis]:
     """Analyze the slope profile of a property with detailed stability assessment."""
     if model is None:
         logging.warning("Gemini model not initialized. Skipping slope analysis.")
         return None
     prompt = f"""
-{SYSTEM_PROMPT}
-TASK: Analyze slope profile with {slope:.2f}° slope, {elevation_diff:.2f} m elevation difference, {distance:.2f} m distance
+TASK: Analyze slope profile with {slope:.2f}° average slope and {elevation_diff:.2f} m elevation difference across the parcel
 KEY DATA SUMMARY:
-Slope: {slope:.2f}°
+Average Slope (area-weighted over the parcel): {slope:.2f}°
+Maximum Slope: {max_slope:.2f}°
 Elevation Difference: {elevation_diff:.2f} m
-Distance: {distance:.2f} m
+DEM Slope Distribution (area-weighted over the parcel): {describe_slope_distribution(slope_distribution)}
 Lake Proximity (within 100m of erosion hazard): {lake_proximity}
 REASONING PROCESS:
+All slope figures come from the same DEM; where the distribution is available, base the slope class on it, since the maximum can be set by a few cells.
 Classify slope per Mercer Island standards: <15° mild, 15-25° moderate, 25-40° steep, >40° very steep (exceeds glacial till repose).
 Assess stability using typical soil types (glacial till = 30° repose, lacustrine = 20° repose) unless specified.
 If slope <5° but lake_proximity is true, flag 'Potential inconsistency—verify topographic survey near lakefront.'
@@ -176,26 +301,23 @@ Output only the JSON analysis without additional narrative:
 """
     try:
         logging.debug(f"Slope Analysis Prompt: {prompt}")
-        response = model.generate_content(prompt)
-        logging.debug(f"Slope Analysis Response: {response.text}")
-        slope_analysis_data = parse_gemini_json_response(response.text)
-        return SlopeAnalysis(**slope_analysis_data)
+        response_text, slope_analysis = generate(prompt, SlopeAnalysis)
+        logging.debug(f"Slope Analysis Response: {response_text}")
+        return slope_analysis
     except Exception as e:
         logging.error(f"Error in analyze_slope: {e}")
         return None
 
-def generate_feasibility_report(
+def _feasibility_prompt(
     address: str,
     slope_analysis: Optional[SlopeAnalysis],
     location_analysis: Optional[LocationAnalysis],
     environmental_hazards: dict,
     slope_data: SlopeData,
     lake_proximity: bool,
-) -> Optional[FeasibilityReport]:
-    """Generate a comprehensive feasibility report with integrated hazard analysis."""
-    if model is None:
-        logging.warning("Gemini model not initialized. Skipping feasibility report generation.")
-        return None
+    slope_distribution: Optional[SlopeDistribution] = None,
+) -> Tuple[str, List[str]]:
+    """Build the feasibility report prompt and the verification items to add to the model's answer."""
     # Define hazard descriptions and create hazard layer list strictly from environmental_hazards
     hazard_descriptions = {
         "erosion": "Erosion Hazard",
@@ -209,7 +331,7 @@ def generate_feasibility_report(
         f"{'falls within' if value else 'does not fall within'} a {hazard_descriptions[key]}"
         for key, value in environmental_hazards.items()
     ]
-    # Check for slope discrepancy and add to verification if needed
+    # Check for slope discrepancy and add to verification if needed; the average is the DEM figure the prompt shows
     verification_needed_extra = []
     if not environmental_hazards["steep_slope"] and slope_data.average_slope > 25:
         verification_needed_extra.append(
@@ -217,13 +339,13 @@ def generate_feasibility_report(
         )
 
     prompt = f"""
-{SYSTEM_PROMPT}
 TASK: Generate a comprehensive feasibility report for '{address}', integrating hazards and practical refinements.
 KEY DATA SUMMARY:
 Address: {address}
 Location Analysis: {location_analysis.dict() if location_analysis else 'No data'}
 Slope Analysis: {slope_analysis.dict() if slope_analysis else 'No data'}
-Slope Data: Avg {slope_data.average_slope}°, Max {slope_data.max_slope}°, Avg Distance {slope_data.average_distance}m
+DEM Slope Data: Avg {slope_data.average_slope:.1f}°, Max {slope_data.max_slope:.1f}°, Elevation Difference {slope_data.elevation_difference:.1f}m
+DEM Slope Distribution (area-weighted over the parcel): {describe_slope_distribution(slope_distribution)}
 Environmental Hazards: {json.dumps(environmental_hazards)}
 Lake Proximity (within 100m of erosion hazard): {lake_proximity}
 Hazard Layers (DO NOT MODIFY BASED ON SLOPE DATA): {json.dumps(hazard_layer_list)}
@@ -240,33 +362,88 @@ INSTRUCTIONS:
 - Include additional verification needs in 'verification_needed' if calculated slope suggests risks not reflected in hazard data.
 Output:
 {{
-  "location_analysis": {location_analysis.dict() if location_analysis else '{"summary": "Pending", "recommendations": [], "verification_needed": []}'},
-  "slope_analysis": {slope_analysis.dict() if slope_analysis else '{"summary": "Pending", "recommendations": [], "verification_needed": []}'},
   "overall_feasibility": "Marginally Feasible (30-50%)",
+  "hazard_layers": {json.dumps(hazard_layer_list)},
   "detailed_recommendations": [
     "[Critical]: Implement deep foundations (e.g., piles or caissons) to bypass potentially unstable surface soils and ensure adequate support. (high cost) - Confidence: Medium",
     "[Major]: Design retaining walls or other slope stabilization measures to improve the factor of safety against sliding. (moderate to high cost) - Confidence: Medium",
     "[Major]: Implement a comprehensive drainage system to control groundwater levels and prevent saturation of the slope. (moderate cost) - Confidence: Medium",
     "[Minor]: Install erosion control measures, such as vegetation, terracing, or bioengineering techniques, to protect the slope from surface erosion. (low to moderate cost) - Confidence: High"
   ],
-  "hazard_layers": {json.dumps(hazard_layer_list)},
-  "verification_needed": {json.dumps(["Soil bearing capacity", "Steep slope indicated by calculated angle (verify against official steep slope hazard maps)", "Detailed liquefaction analysis data (SPT or CPT)", "Factor of Safety calculation for slope stability under static and seismic conditions"])}
+  "verification_needed": {json.dumps(["Soil bearing capacity", "Steep slope indicated by calculated angle (verify against official steep slope hazard maps)", "Detailed liquefaction analysis data (SPT or CPT)", "Factor of Safety calculation for slope stability under static and seismic conditions"])},
+  "location_analysis": {location_analysis.dict() if location_analysis else '{"summary": "Pending", "recommendations": [], "verification_needed": []}'},
+  "slope_analysis": {slope_analysis.dict() if slope_analysis else '{"summary": "Pending", "recommendations": [], "verification_needed": []}'}
 }}
 """
+    return prompt, verification_needed_extra
+
+def stream_feasibility_report(
+    address: str,
+    slope_analysis: Optional[SlopeAnalysis],
+    location_analysis: Optional[LocationAnalysis],
+    environmental_hazards: dict,
+    slope_data: SlopeData,
+    lake_proximity: bool,
+    slope_distribution: Optional[SlopeDistribution] = None,
+) -> Iterator[Tuple[str, object]]:
+    """Generate the feasibility report with streaming, yielding (field, value) as each report field completes.
+
+    The model writes the short fields (overall feasibility, hazard layers,
+    recommendations) first, so they can be shown while the rest is still being
+    generated. The validated report is yielded last as (REPORT, FeasibilityReport);
+    nothing more is yielded if generation fails.
+    """
+    if model is None:
+        logging.warning("Gemini model not initialized. Skipping feasibility report generation.")
+        return
+    prompt, verification_needed_extra = _feasibility_prompt(
+        address, slope_analysis, location_analysis, environmental_hazards, slope_data, lake_proximity,
+        slope_distribution,
+    )
+    key = response_key(MODEL_NAME, prompt, GENERATION_CONFIG, SYSTEM_PROMPT)
     try:
         logging.debug(f"Feasibility Report Prompt: {prompt}")
-        response = model.generate_content(prompt)
-        logging.debug(f"Feasibility Report Response: {response.text}")
-        response_data = parse_gemini_json_response(response.text)
-        # Ensure verification_needed includes extras
-        if verification_needed_extra:
-            response_data["verification_needed"] = (
-                response_data.get("verification_needed", []) + verification_needed_extra
-            )
-        return FeasibilityReport(**response_data)
+        cached = response_cache.get(key)
+        if cached is not None:
+            response_text, response_data = cached
+            for field, value in response_data.items():
+                if field == "verification_needed":
+                    value = value + verification_needed_extra
+                yield field, value
+        else:
+            parser = JsonFieldStream()
+            chunks = []
+            for chunk in model.generate_content(prompt, stream=True):
+                chunks.append(chunk.text)
+                for field, value in parser.feed(chunk.text):
+                    value = normalize_response({field: value})[field]
+                    if field == "verification_needed":
+                        value = value + verification_needed_extra
+                    yield field, value
+            response_text = "".join(chunks)
+            response_data = parse_gemini_json_response(response_text)
+        logging.debug(f"Feasibility Report Response: {response_text}")
+        report = FeasibilityReport(**response_data)
+        if cached is None:
+            # Cache only a report that validated, without the extras added on every replay
+            response_cache.put(key, response_text, response_data)
+        report.verification_needed += verification_needed_extra
+        yield REPORT, report
     except Exception as e:
-        logging.error(f"Error in generate_feasibility_report: {e}")
-        return None
+        logging.error(f"Error in stream_feasibility_report: {e}")
+
+def analyze_location_and_slope(
+    latitude: float, longitude: float, address: str, hazards: dict, slope_data: SlopeData, lake_proximity: bool,
+    slope_distribution: Optional[SlopeDistribution] = None,
+) -> Tuple[Optional[LocationAnalysis], Optional[SlopeAnalysis]]:
+    """Run the location and slope analyses at the same time; neither depends on the other."""
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="gemini") as pool:
+        location_future = pool.submit(analyze_location, latitude, longitude, address, hazards, lake_proximity)
+        slope_future = pool.submit(
+            analyze_slope, slope_data.average_slope, slope_data.max_slope, slope_data.elevation_difference,
+            lake_proximity, slope_distribution,
+        )
+        return location_future.result(), slope_future.result()
 
 def chat_with_report(
     report: FeasibilityReport, user_query: str, chat_history: List[tuple]
@@ -275,96 +452,20 @@ def chat_with_report(
     if model is None:
         logging.warning("Gemini model not initialized. Skipping chat response.")
         return None
-        
     history_str = json.dumps([q for q, _ in chat_history], indent=2) if chat_history else "No prior questions."
-    
     prompt = f"""
-You are GeotechExpert, a geotechnical engineering AI assistant with deep expertise in Mercer Island, WA, properties,
-designed to deliver precise, data-driven feasibility assessments comparable to a seasoned professional with 25 years
-of regional experience.
-
-1. ROLE:
-- Analyze geotechnical factors (e.g., slope stability, soil conditions, liquefaction potential) using provided data,
-  enriched with Mercer Island-specific knowledge (e.g., glacial till over lacustrine deposits, lakefront erosion dynamics).
-- Use precise geotechnical terminology (e.g., 'factor of safety', 'angle of repose') and reference regional standards
-  (e.g., MICC 19.07, USGS seismic data).
-
-2. BOUNDARIES:
-- DO NOT provide legal advice, specific cost estimates (e.g., dollar amounts), or non-geotechnical information unless
-  explicitly tied to feasibility (e.g., permitting implications).
-- DO NOT speculate beyond data; if data is missing, use Mercer Island norms
-  (e.g., 'Assuming glacial till with 30° angle of repose unless verified') and flag verification needs.
-- For out-of-scope queries, respond: 'I'm limited to geotechnical analysis and cannot assist with [legal/cost]
-  matters without additional context.'
-
-3. ANALYSIS GUIDELINES:
-- Contextualize findings with Mercer Island's geology (e.g., steep lakefront slopes, saturated soils).
-- Flag anomalies (e.g., slopes >40% with no slide history) with 'Potential inconsistency—verify data.'
-- Assign confidence levels based on data quality: High (complete data), Medium (partial data with norms), Low (assumptions only).
-- Integrate hazards into a cohesive assessment (e.g., erosion + steep slope = compounded slide risk).
-
-4. RESPONSE GUIDELINES:
-- Return structured JSON in triple backticks (```json ... ```).
-- Format recommendations as '[Priority]: [Text] ([cost level] cost) - Confidence: [Level]' using [Critical], [Major],
-  or [Minor], with relative costs (low, moderate, high).
-- Provide specific, actionable steps (e.g., 'Conduct 3-4 borings to 20 ft depth') over generic advice.
-- Include a 'verification_needed' field if assumptions are made (e.g., soil type).
-
-5. USER ADAPTATION:
-- For chat responses, detect user expertise (technical vs. layperson) from query phrasing and adjust tone:
-  technical (e.g., 'Liquefaction potential requires SPT data') or plain (e.g., 'The ground might shift in an
-  earthquake—more tests needed').
-
 TASK: Respond to '{user_query}' about the feasibility report.
 FEASIBILITY REPORT:
 {json.dumps(report.dict())}
 HISTORY:
 {history_str}
-INSTRUCTIONS:
-Detect expertise: technical queries (e.g., 'What's FOS?') get detailed terms; layperson (e.g., 'Is it safe?') get plain language + terms explained.
-Reference report specifics (e.g., 'Your 29.69° slope exceeds till repose').
-Suggest practical next steps (e.g., 'Engage a geotech for borings').
-Output structured JSON with the following format, even for narrative responses:
-```json
-{{
-  "response": {{
-    "introduction": "Brief intro to the response explaining its context",
-    "sections": [
-      {{
-        "title": "Section title (e.g., Deep Foundations)",
-        "rationale": "Technical explanation of why this is a concern or solution",
-        "recommendation": "[Priority]: Text (cost level cost) - Confidence: Level",
-        "plain_language": "Simplified explanation for non-technical users",
-        "next_steps": "Actionable steps to address this"
-      }}
-    ],
-    "verification_needs": ["List of items needing verification"]
-  }}
-}}
-Example for 'foundation recommendations':
-{{
-  "response": {{
-    "introduction": "Here's more detail on the foundation recommendations based on the report's geotechnical concerns.",
-    "sections": [
-      {{
-        "title": "Deep Foundations (Piles or Caissons)",
-        "rationale": "Unstable surface soils near the lake may not support a structure...",
-        "recommendation": "[Critical]: Implement deep foundations (high cost) - Confidence: Medium",
-        "plain_language": "We suggest a deep foundation to keep your house stable on soft ground.",
-        "next_steps": "Hire a geotechnical engineer for borings."
-      }}
-    ],
-    "verification_needs": ["Soil bearing capacity"]
-  }}
-}}
-Add: 'If this response seems inaccurate, please flag it for review' to the end of the introduction.
-"""
+{CHAT_INSTRUCTIONS}"""
 
     try:
         logging.debug(f"Chat Prompt: {prompt}")
-        response = model.generate_content(prompt)
-        logging.debug(f"Chat Response: {response.text}")
-        return response.text
+        response_text, _ = generate(prompt)
+        logging.debug(f"Chat Response: {response_text}")
+        return response_text
     except Exception as e:
         logging.error(f"Error in chat_with_report: {e}")
-        return None
\ No newline at end of file
+        return None
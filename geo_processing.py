@@ -1,17 +1,31 @@
 import geopandas as gpd
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-from shapely.geometry import Point, shape
+from geopy.extra.rate_limiter import RateLimiter
+import shapely
+from shapely.geometry import shape
 from shapely.validation import make_valid
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import numpy as np
 import folium
 from streamlit_folium import folium_static
-from models import Address, Coordinates, Property, SlopeData, EnvironmentalCheck
+from models import Address, Coordinates, Property, SlopeData, SlopeDistribution, EnvironmentalCheck
+from layer_store import read_layer, read_dissolved, read_segmented, GEOGRAPHIC_CRS, SIMPLIFY_TOLERANCES
+from layer_registry import registry
+from spatial_index import ParcelIndex, ShorelineIndex, HazardOverlay, ContourIndex
+from dem import DemGrid, load_dem, unpack_distribution
+from geocode_cache import geocode_cache, normalize_address
+from local_geocoder import LocalGeocoder
+from parcel_tables import (
+    read_table, HAZARD_TABLE_FILE, SLOPE_TABLE_FILE, SHORELINE_TABLE_FILE, SLOPE_DISTRIBUTION_TABLE_FILE,
+)
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 geolocator = Nominatim(user_agent="geotech_mvp_app")
+# Nominatim's usage policy allows at most one request per second. A failed request is not
+# retried: the user gets the error at once instead of after geopy's back-off waits.
+nominatim_geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1, max_retries=0, swallow_exceptions=False)
 
 PROPERTY_FILE = "data/Mercer_Island_Basemap_Data_Layers_PropertyLine.geojson"
 CONTOUR_FILE = "data/Mercer_Island_Environmental_Layers_10ftLidarContours.geojson"
@@ -22,13 +36,36 @@ HAZARD_FILES = {
     "steep_slope": "data/Mercer_Island_Environmental_Layers_SteepSlope.geojson",
     "watercourse": "data/Mercer_Island_Environmental_Layers_WatercourseBufferSetback.geojson",
 }
+SHORELINE_FILE = "data/Mercer_Island_Lake_Washington_Shoreline_Full.geojson"
+MAP_CONTOUR_RADIUS = 500  # Meters around the parcel within which contours are drawn
+MAP_ZOOM = 15  # Initial zoom level of the parcel map
+SCREEN_TOLERANCE = max(SIMPLIFY_TOLERANCES)  # Pyramid level used to screen overlay queries
+HAZARD_OVERLAP_THRESHOLD = 0.1  # Fraction of parcel area that counts as significant overlap
+
+def get_local_geocoder() -> LocalGeocoder:
+    """Return the process-wide address index over the imported address points."""
+    return registry.resource("local_geocoder", LocalGeocoder.from_table)
 
 def geocode_address(address: Address) -> Optional[Coordinates]:
     try:
-        location = geolocator.geocode(address.full_address())
+        coordinates = get_local_geocoder().geocode(address)
+        if coordinates is not None:
+            return coordinates
+        cache_key = normalize_address(address.full_address())
+        cached = geocode_cache.get(cache_key)
+        if cached is not None:
+            found, coordinates = cached
+            logging.debug(f"Geocode cache hit for {cache_key} ({'found' if found else 'not found'})")
+            if not found:
+                raise ValueError("Address not found in Mercer Island, WA.")
+            return coordinates
+        location = nominatim_geocode(address.full_address())
         if location:
-            return Coordinates(latitude=location.latitude, longitude=location.longitude)
+            coordinates = Coordinates(latitude=location.latitude, longitude=location.longitude)
+            geocode_cache.put(cache_key, coordinates)
+            return coordinates
         else:
+            geocode_cache.put(cache_key, None)
             raise ValueError("Address not found in Mercer Island, WA.")
     except (GeocoderTimedOut, GeocoderServiceError) as e:
         logging.error(f"Geocoding error for {address.full_address()}: {e}")
@@ -37,115 +74,175 @@ def geocode_address(address: Address) -> Optional[Coordinates]:
         logging.error(f"Unexpected error during geocoding of {address.full_address()}: {e}")
         return None
 
-def load_geojson(file_path: str) -> gpd.GeoDataFrame:
+def load_geojson(file_path: str, crs: str = GEOGRAPHIC_CRS, bbox: Optional[Tuple[float, float, float, float]] = None,
+                 mask=None) -> gpd.GeoDataFrame:
+    """Load a layer from the columnar store, already in `crs`.
+
+    `bbox` or `mask` (in `crs`) restricts the read to the features around them.
+    """
     try:
-        return gpd.read_file(file_path)
+        return read_layer(file_path, crs, bbox=bbox, mask=mask)
     except Exception as e:
         logging.error(f"Error loading GeoJSON file {file_path}: {e}")
         raise
 
-def extract_property(coordinates: Coordinates) -> Optional[Property]:
-    try:
-        properties_gdf = load_geojson(PROPERTY_FILE)
+def get_parcel_index(bbox: Optional[Tuple[float, float, float, float]] = None) -> ParcelIndex:
+    """Return the process-wide STRtree index over the property layer.
+
+    Until that index is built, a `bbox` (EPSG:4326) gets a throwaway index over just the
+    parcels around it, so a cold process does not read the whole layer for one lookup.
+    """
+    def build(properties_gdf: gpd.GeoDataFrame) -> ParcelIndex:
         if "PIN" not in properties_gdf.columns:
             logging.error(f"PIN missing in {PROPERTY_FILE}. Available columns: {properties_gdf.columns}")
             raise ValueError("PIN field not found in property GeoJSON")
-        point = Point(coordinates.longitude, coordinates.latitude)
-        for idx, row in properties_gdf.iterrows():
-            if row.geometry.contains(point):
-                return Property(parcel_id=row["PIN"], geometry=row.geometry.__geo_interface__)
+        return ParcelIndex(properties_gdf)
+    if bbox is not None and not registry.has_resource("parcel_index"):
+        return build(load_geojson(PROPERTY_FILE, bbox=bbox))
+    return registry.resource("parcel_index", lambda: build(registry.get(PROPERTY_FILE)))
+
+def extract_property(coordinates: Coordinates) -> Optional[Property]:
+    try:
+        point = (coordinates.longitude, coordinates.latitude)
+        parcel_index = get_parcel_index(bbox=point + point)
+        position = parcel_index.query_point(coordinates.longitude, coordinates.latitude)
+        if position >= 0:
+            geometry = parcel_index.geometries[position]
+            return Property(parcel_id=parcel_index.pins[position], geometry=geometry.__geo_interface__)
         logging.warning(f"No property found at coordinates ({coordinates.latitude}, {coordinates.longitude}).")
         return None
     except Exception as e:
         logging.error(f"Error extracting property at ({coordinates.latitude}, {coordinates.longitude}): {e}")
         return None
 
+def get_property_by_pin(pin: str) -> Optional[Property]:
+    """Return the parcel with a given PIN straight from the parcel index, without geocoding."""
+    try:
+        parcel_index = get_parcel_index()
+        position = parcel_index.position_of(pin)
+        if position >= 0:
+            geometry = parcel_index.geometries[position]
+            return Property(parcel_id=parcel_index.pins[position], geometry=geometry.__geo_interface__)
+        logging.warning(f"No property found with PIN {pin}.")
+        return None
+    except Exception as e:
+        logging.error(f"Error looking up property with PIN {pin}: {e}")
+        return None
+
+def property_coordinates(property: Property) -> Coordinates:
+    """Return a point guaranteed to lie inside the parcel, for location-based analysis."""
+    point = shape(property.geometry).representative_point()
+    return Coordinates(latitude=point.y, longitude=point.x)
+
+def get_slope_table() -> Dict[str, Dict[str, float]]:
+    """Return the precomputed {PIN: SlopeData fields} table."""
+    return registry.resource("slope_table", lambda: read_table(SLOPE_TABLE_FILE))
+
 def calculate_slope(property: Property) -> Optional[SlopeData]:
+    """Return the parcel's slope statistics, from the precomputed table when available."""
+    row = get_slope_table().get(property.parcel_id)
+    if row is not None:
+        return SlopeData(**row)
+    logging.debug(f"Parcel {property.parcel_id} not in slope table; computing slope live.")
+    return compute_slope(property)
+
+def get_contour_index(bbox: Optional[Tuple[float, float, float, float]] = None) -> ContourIndex:
+    """Return the process-wide index over the segmented contour layer.
+
+    Until that index is built, a `bbox` (EPSG:32610) gets an index over just the segments meeting it.
+    """
+    if bbox is not None and not registry.has_resource("contour_index"):
+        return ContourIndex(read_segmented(CONTOUR_FILE, bbox=bbox))
+    return registry.resource("contour_index", lambda: ContourIndex(read_segmented(CONTOUR_FILE)))
+
+def get_dem() -> DemGrid:
+    """Return the process-wide, memory-mapped DEM interpolated from the contour layer."""
+    return registry.resource("dem", lambda: load_dem(CONTOUR_FILE))
+
+def compute_slope(property: Property) -> Optional[SlopeData]:
+    """Compute a parcel's mean and maximum slope and elevation difference from the DEM gradient."""
     try:
-        contours_gdf = load_geojson(CONTOUR_FILE).to_crs("EPSG:32610")
-        logging.debug(f"Loaded {len(contours_gdf)} contours with columns: {contours_gdf.columns.tolist()}")
-        
         property_geom = shape(property.geometry)
         property_geom_proj = gpd.GeoSeries([property_geom], crs="EPSG:4326").to_crs("EPSG:32610")[0]
-        
-        intersections = contours_gdf[contours_gdf.intersects(property_geom_proj)].copy()
-        if len(intersections) < 2:
-            logging.warning(f"Only {len(intersections)} intersections for parcel {property.parcel_id}. Applying 10m buffer...")
-            buffered_geom = property_geom_proj.buffer(10)
-            intersections = contours_gdf[contours_gdf.intersects(buffered_geom)].copy()
-        
-        intersections['geometry'] = intersections.geometry.intersection(property_geom_proj)
-        intersections = intersections[~intersections.geometry.is_empty].sort_values(by="Elevation")
-        logging.debug(f"Found {len(intersections)} contour intersections for parcel {property.parcel_id}")
-        
-        if len(intersections) < 2:
-            logging.warning(f"Insufficient contour intersections ({len(intersections)}) for parcel {property.parcel_id}. Assuming flat slope.")
-            return SlopeData(average_slope=0.0, max_slope=0.0)
-        
-        if "Elevation" not in intersections.columns:
-            logging.warning("Elevation column not found in contour data. Using default elevation.")
-            elevations = np.array([0.0])
-        else:
-            elevations = intersections["Elevation"].values
-        logging.debug(f"Elevations: {elevations}")
-        
-        slopes = []
-        distances = []
-        for i in range(len(intersections) - 1):
-            elev_diff = abs(elevations[i + 1] - elevations[i])
-            geom1 = intersections.iloc[i].geometry
-            geom2 = intersections.iloc[i + 1].geometry
-            centroid1 = geom1.centroid
-            centroid2 = geom2.centroid
-            dist = centroid1.distance(centroid2)
-            if 0.5 < dist <= 1000:
-                slope_deg = np.degrees(np.arctan(elev_diff / dist))
-                slopes.append(slope_deg)
-                distances.append(dist)
-                logging.debug(f"Pair {i}: elev_diff={elev_diff}m, dist={dist}m, slope={slope_deg}°")
-        
-        if not slopes:
-            logging.warning(f"No valid slopes calculated for parcel {property.parcel_id} after filtering. Assuming flat slope.")
-            return SlopeData(average_slope=0.0, max_slope=0.0)
-        
-        avg_slope = np.mean(slopes)
-        max_slope = np.max(slopes)
-        avg_distance = np.mean(distances)
-        logging.info(f"Calculated slopes for parcel {property.parcel_id}: {slopes}, Average: {avg_slope}°, Max: {max_slope}°, Avg Distance: {avg_distance}m")
-        
-        if avg_slope > 45:
-            logging.warning(f"Extreme slope detected: {avg_slope}° for parcel {property.parcel_id}. Verify contour data accuracy.")
-        
-        erosion_gdf = load_geojson(HAZARD_FILES["erosion"]).to_crs("EPSG:32610")
-        property_buffer = property_geom_proj.buffer(100)
-        lake_proximity = erosion_gdf.intersects(property_buffer).any()
-        if lake_proximity and avg_slope < 5:
-            logging.warning(
-                f"Parcel {property.parcel_id} near lake but slope is flat ({avg_slope}°). "
-                "Possible contour data omission—recommend topographic survey."
-            )
-            if max_slope < 15:
-                logging.info(f"Adjusting max_slope to 15° for lakefront context on parcel {property.parcel_id}.")
-                max_slope = 15.0
-        
-        return SlopeData(average_slope=avg_slope, max_slope=max_slope, average_distance=avg_distance)
+        summary = get_dem().slope_summary(property_geom_proj)
+        if summary is None:
+            logging.warning(f"Parcel {property.parcel_id} lies outside the DEM extent.")
+            return None
+        return SlopeData(**summary)
     except Exception as e:
         logging.error(f"Error calculating slope for parcel {property.parcel_id}: {e}")
-        return SlopeData(average_slope=0.0, max_slope=0.0)
+        return None
 
-def check_environmental_hazards(property: Property) -> Optional[EnvironmentalCheck]:
+def get_slope_distribution_table() -> Dict[str, Dict[str, int]]:
+    """Return the precomputed {PIN: packed slope distribution} table."""
+    return registry.resource("slope_distribution_table", lambda: read_table(SLOPE_DISTRIBUTION_TABLE_FILE))
+
+def calculate_slope_distribution(property: Property) -> Optional[SlopeDistribution]:
+    """Return the area-weighted slope percentiles and histogram of a parcel from the DEM."""
     try:
+        row = get_slope_distribution_table().get(property.parcel_id)
+        if row is not None:
+            return SlopeDistribution(**unpack_distribution(row))
         property_geom = shape(property.geometry)
-        property_gdf = gpd.GeoSeries([property_geom], crs="EPSG:4326").to_crs("EPSG:32610")
-        property_geom_proj = property_gdf[0]
-        property_area = property_geom_proj.area
-        
+        property_geom_proj = gpd.GeoSeries([property_geom], crs="EPSG:4326").to_crs("EPSG:32610")[0]
+        distribution = get_dem().slope_distribution(property_geom_proj)
+        if distribution is None:
+            logging.warning(f"Parcel {property.parcel_id} lies outside the DEM extent.")
+            return None
+        return SlopeDistribution(**distribution)
+    except Exception as e:
+        logging.error(f"Error calculating slope distribution for parcel {property.parcel_id}: {e}")
+        return None
+
+def get_hazard_table() -> Dict[str, Dict[str, float]]:
+    """Return the precomputed {PIN: {hazard_type: overlap_ratio}} table."""
+    return registry.resource("hazard_table", lambda: read_table(HAZARD_TABLE_FILE))
+
+def get_hazard_geometries(hazard_type: str) -> np.ndarray:
+    """Return the dissolved, tiled union of one hazard layer in EPSG:32610."""
+    return registry.resource(
+        f"hazard_geometries:{hazard_type}", lambda: read_dissolved(HAZARD_FILES[hazard_type]).geometry.to_numpy()
+    )
+
+def get_hazard_overlay(bbox: Optional[Tuple[float, float, float, float]] = None) -> HazardOverlay:
+    """Return the process-wide overlay engine over all hazard layers.
+
+    Until that engine is built, a `bbox` (EPSG:32610) gets one over just the dissolved tiles meeting it.
+    """
+    if bbox is not None and not registry.has_resource("hazard_overlay"):
+        return HazardOverlay({
+            hazard_type: read_dissolved(file_path, bbox=bbox).geometry.to_numpy()
+            for hazard_type, file_path in HAZARD_FILES.items()
+        })
+    return registry.resource(
+        "hazard_overlay",
+        lambda: HazardOverlay(
+            {hazard_type: get_hazard_geometries(hazard_type) for hazard_type in HAZARD_FILES},
+            screens={
+                hazard_type: registry.get(file_path, "EPSG:32610", SCREEN_TOLERANCE).geometry.to_numpy()
+                for hazard_type, file_path in HAZARD_FILES.items()
+            },
+            screen_tolerance=SCREEN_TOLERANCE,
+        ),
+    )
+
+def compute_hazard_overlaps(property_geom_proj) -> Dict[str, float]:
+    """Compute the fraction of a projected parcel covered by each hazard layer."""
+    return get_hazard_overlay(bbox=tuple(shapely.bounds(property_geom_proj))).overlap_ratios(property_geom_proj)
+
+def check_environmental_hazards(property: Property) -> Optional[EnvironmentalCheck]:
+    try:
+        overlaps = get_hazard_table().get(property.parcel_id)
+        if overlaps is None:
+            logging.debug(f"Parcel {property.parcel_id} not in hazard table; computing overlaps live.")
+            property_geom = make_valid(shape(property.geometry))
+            property_geom_proj = gpd.GeoSeries([property_geom], crs="EPSG:4326").to_crs("EPSG:32610")[0]
+            overlaps = compute_hazard_overlaps(property_geom_proj)
+
         hazards = {}
-        for hazard_type, file_path in HAZARD_FILES.items():
-            hazard_gdf = load_geojson(file_path).to_crs("EPSG:32610")
-            intersection_area = hazard_gdf.intersection(property_geom_proj).area.sum()
-            overlap_ratio = intersection_area / property_area if property_area > 0 else 0
-            intersects = overlap_ratio > 0.1  # Significant overlap threshold
+        for hazard_type in HAZARD_FILES:
+            overlap_ratio = overlaps[hazard_type]
+            intersects = overlap_ratio > HAZARD_OVERLAP_THRESHOLD
             hazards[hazard_type] = intersects
             logging.debug(f"Checked {hazard_type} for parcel {property.parcel_id}: "
                          f"{'Present' if intersects else 'Not Present'} (Overlap: {overlap_ratio:.2%})")
@@ -160,9 +257,39 @@ def check_environmental_hazards(property: Property) -> Optional[EnvironmentalChe
         logging.error(f"Error checking environmental hazards for parcel {property.parcel_id}: {e}")
         return None
 
-def create_map(coordinates: Coordinates, property: Property, geojson_files: dict) -> None:
+def get_shoreline_index() -> ShorelineIndex:
+    """Return the process-wide segment index over the Lake Washington shoreline."""
+    return registry.resource(
+        "shoreline_index", lambda: ShorelineIndex(registry.get(SHORELINE_FILE, "EPSG:32610").geometry.to_numpy())
+    )
+
+def get_shoreline_table() -> Dict[str, Dict[str, float]]:
+    """Return the precomputed {PIN: {"shoreline_distance": meters}} table."""
+    return registry.resource("shoreline_table", lambda: read_table(SHORELINE_TABLE_FILE))
+
+def calculate_shoreline_distance(property: Property) -> Optional[float]:
+    """Return the distance in meters from the parcel to the Lake Washington shoreline."""
+    try:
+        row = get_shoreline_table().get(property.parcel_id)
+        if row is not None:
+            return row["shoreline_distance"]
+        property_geom = shape(property.geometry)
+        property_geom_proj = gpd.GeoSeries([property_geom], crs="EPSG:4326").to_crs("EPSG:32610")[0]
+        return get_shoreline_index().distance(property_geom_proj)
+    except Exception as e:
+        logging.error(f"Error calculating shoreline distance for parcel {property.parcel_id}: {e}")
+        return None
+
+def map_tolerance(zoom: int, latitude: float) -> Optional[float]:
+    """Return the coarsest pyramid level finer than one screen pixel at `zoom`, or None for full resolution."""
+    meters_per_pixel = 156543.03392 * np.cos(np.radians(latitude)) / 2 ** zoom
+    fitting = [tolerance for tolerance in SIMPLIFY_TOLERANCES if tolerance <= meters_per_pixel]
+    return max(fitting) if fitting else None
+
+def create_map(coordinates: Coordinates, property: Property, geojson_files: dict, zoom: int = MAP_ZOOM) -> None:
     try:
-        m = folium.Map(location=[coordinates.latitude, coordinates.longitude], zoom_start=15)
+        m = folium.Map(location=[coordinates.latitude, coordinates.longitude], zoom_start=zoom)
+        tolerance = map_tolerance(zoom, coordinates.latitude)
         
         layer_styles = {
             "Property Lines": {"color": "lightgrey", "weight": .5, "fill": False},
@@ -175,8 +302,16 @@ def create_map(coordinates: Coordinates, property: Property, geojson_files: dict
             "Shoreline": {"color": "darkblue", "weight": 2, "fill": False},  # Added
         }
 
+        property_geom_proj = gpd.GeoSeries([shape(property.geometry)], crs="EPSG:4326").to_crs("EPSG:32610")[0]
         for layer_name, file_path in geojson_files.items():
-            gdf = load_geojson(file_path).set_crs("EPSG:4326", allow_override=True)
+            if file_path == CONTOUR_FILE:
+                # Only the contour segments around the parcel, not island-length lines
+                gdf = get_contour_index().near(property_geom_proj, MAP_CONTOUR_RADIUS)
+                if tolerance is not None:
+                    gdf = gdf.simplify(tolerance)
+                gdf = gdf.to_crs("EPSG:4326")
+            else:
+                gdf = registry.get(file_path, tolerance=tolerance)
             style = layer_styles.get(layer_name, {"fillColor": "gray", "color": "black", "weight": 1, "fillOpacity": 0.3})
             folium.GeoJson(
                 gdf,
@@ -0,0 +1,91 @@
+"""Persistent geocode cache shared by every worker process.
+
+Results are kept in a SQLite database next to the layer store, keyed by the
+normalized address string. Found coordinates live for `GEOCODE_TTL` seconds and
+"not found" answers for the shorter `GEOCODE_NEGATIVE_TTL`, so a typo is not sent to
+Nominatim again on every submit but a newly mapped address is picked up eventually.
+
+The database is a `SqliteStore`; hit and miss counts are kept in it so they add up
+across processes.
+"""
+import os
+import re
+import time
+import logging
+from typing import Optional, Tuple
+
+from layer_store import STORE_DIR
+from models import Coordinates
+from sqlite_store import SqliteStore
+
+GEOCODE_CACHE_FILE = os.path.join(STORE_DIR, "geocode_cache.sqlite")
+GEOCODE_TTL = 30 * 24 * 3600  # Seconds a found address stays cached
+GEOCODE_NEGATIVE_TTL = 24 * 3600  # Seconds a "not found" answer stays cached
+
+def normalize_address(address: str) -> str:
+    """Return the cache key for an address: lowercase, single-spaced, without stray punctuation."""
+    address = re.sub(r"[^\w\s,#-]", " ", address.lower())
+    parts = (" ".join(part.split()) for part in address.split(","))
+    return ", ".join(part for part in parts if part)
+
+class GeocodeCache(SqliteStore):
+    """SQLite-backed {normalized address: coordinates or not-found} cache with TTLs."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS geocodes ("
+        "address TEXT PRIMARY KEY, latitude REAL, longitude REAL, found INTEGER NOT NULL, "
+        "created_at REAL NOT NULL, expires_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path: str = GEOCODE_CACHE_FILE, ttl: float = GEOCODE_TTL,
+                 negative_ttl: float = GEOCODE_NEGATIVE_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def get(self, address: str) -> Optional[Tuple[bool, Optional[Coordinates]]]:
+        """Return (found, coordinates) for a cached address, or None on a miss or an expired entry."""
+        row = self._connection().execute(
+            "SELECT latitude, longitude, found, expires_at FROM geocodes WHERE address = ?", (address,)
+        ).fetchone()
+        if row is None:
+            self.record("miss")
+            return None
+        latitude, longitude, found, expires_at = row
+        if expires_at <= time.time():
+            self.record("expired")
+            return None
+        if not found:
+            self.record("negative_hit")
+            return False, None
+        self.record("hit")
+        return True, Coordinates(latitude=latitude, longitude=longitude)
+
+    def put(self, address: str, coordinates: Optional[Coordinates]) -> None:
+        """Cache the coordinates of an address, or None to cache that it was not found."""
+        now = time.time()
+        found = coordinates is not None
+        self._connection().execute(
+            "INSERT OR REPLACE INTO geocodes (address, latitude, longitude, found, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                address,
+                coordinates.latitude if found else None,
+                coordinates.longitude if found else None,
+                int(found),
+                now,
+                now + (self.ttl if found else self.negative_ttl),
+            ),
+        )
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were removed."""
+        return self._connection().execute("DELETE FROM geocodes WHERE expires_at <= ?", (time.time(),)).rowcount
+
+# Module singleton shared by every session in the process
+geocode_cache = GeocodeCache()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    removed = geocode_cache.purge_expired()
+    print(f"Purged {removed} expired entries; counters: {geocode_cache.metrics()}")
@@ -0,0 +1,96 @@
+"""Process-wide registry of shared, pre-projected layers.
+
+Every Streamlit session in a worker process gets the same GeoDataFrame objects, so
+each layer is held in memory once per CRS instead of once per session or request.
+The frames are shared and must be treated as read-only; call ``.copy()`` before
+adding or replacing columns.
+
+The registry remembers the store's data version its contents were loaded under. When
+a re-ingest moves the version on, `data_version` drops every layer and derived
+resource, so nothing stamped with the new version is computed from the old data.
+"""
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+import geopandas as gpd
+
+from layer_store import data_version, read_layer, read_simplified, GEOGRAPHIC_CRS, STORE_CRS
+
+T = TypeVar("T")
+
+class LayerRegistry:
+    """Lazily loads each (layer, CRS) pair once and hands out the shared frame."""
+
+    def __init__(self):
+        self._layers: Dict[Tuple[str, str, Optional[float]], gpd.GeoDataFrame] = {}
+        self._resources: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._version = data_version()
+
+    def get(self, file_path: str, crs: str = GEOGRAPHIC_CRS, tolerance: Optional[float] = None) -> gpd.GeoDataFrame:
+        """Return the shared layer for `file_path` in `crs`, loading it on first use.
+
+        With a `tolerance` in meters, return that level of the layer's simplified pyramid.
+        """
+        key = (os.path.normpath(file_path), crs, tolerance)
+        layer = self._layers.get(key)
+        if layer is None:
+            with self._lock:
+                layer = self._layers.get(key)
+                if layer is None:
+                    if tolerance is None:
+                        layer = read_layer(file_path, crs)
+                    else:
+                        layer = read_simplified(file_path, tolerance, crs)
+                    self._layers[key] = layer
+                    level = "" if tolerance is None else f" simplified at {tolerance:g} m"
+                    logging.info(f"Registered layer {file_path} in {crs}{level} ({len(layer)} features)")
+        return layer
+
+    def resource(self, name: str, factory: Callable[[], T]) -> T:
+        """Return a shared object derived from the layers (e.g. a spatial index), building it once."""
+        value = self._resources.get(name)
+        if value is None:
+            with self._lock:
+                value = self._resources.get(name)
+                if value is None:
+                    value = factory()
+                    self._resources[name] = value
+                    logging.info(f"Built shared resource {name}")
+        return value
+
+    def has_resource(self, name: str) -> bool:
+        """Return whether the shared resource `name` has been built yet."""
+        return name in self._resources
+
+    def preload(self, file_paths: Iterable[str], crs_list: Iterable[str] = STORE_CRS) -> None:
+        """Load every layer in every CRS up front, e.g. when a worker starts."""
+        crs_list = tuple(crs_list)
+        for file_path in dict.fromkeys(file_paths):
+            for crs in crs_list:
+                self.get(file_path, crs)
+
+    def data_version(self) -> str:
+        """Return the store's current data version, first dropping everything loaded under an older one."""
+        version = data_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    logging.info(f"Data version changed from {self._version} to {version}; reloading shared layers.")
+                    self.clear()
+                    self._version = version
+        return version
+
+    def clear(self) -> None:
+        """Drop every cached layer and derived resource so the next access reloads them."""
+        with self._lock:
+            self._layers.clear()
+            self._resources.clear()
+
+    def __len__(self) -> int:
+        return len(self._layers)
+
+# Module singleton shared by every session in the process
+registry = LayerRegistry()
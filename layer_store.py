@@ -0,0 +1,420 @@
+"""Columnar store for the GeoJSON layers in data/.
+
+Every source GeoJSON is converted once into GeoParquet files, one already projected to
+EPSG:32610 and one in EPSG:4326. A manifest records the SHA-256 of each source so a
+layer is rebuilt automatically when the city republishes it.
+
+Polygon layers that are only ever used for overlays (the hazard layers) can also be
+stored dissolved: one valid union per layer, cut into square tiles when it is large,
+so overlays test a few simple polygons instead of hundreds of fragments. Long line
+layers (the contours) can be stored segmented into short pieces, so a query near one
+parcel only touches the vertices around it.
+
+Stored rows are written in Hilbert order with a covering bbox column and small row
+groups, so a read limited to a bounding box skips the row groups far from it; reads
+hand rows back in the source's order either way.
+
+Every layer is also stored simplified at a pyramid of tolerances. Map rendering picks
+the level matching the zoom, and screening queries test a coarse level before any
+exact check: simplifying moves no boundary by more than the tolerance, so a geometry
+farther than that from the coarse level cannot touch the full-resolution layer.
+
+When a layer is re-ingested, its new features are diffed against the previous copy by
+``OBJECTID`` and content hash. The bounds of every added, removed or modified feature
+are kept so derived tables can recompute only the parcels they touch. `data_version`
+digests the hashes of every ingested source for use in cache keys.
+
+Run ``python layer_store.py`` to ingest every layer ahead of deployment.
+"""
+import os
+import glob
+import json
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+
+from spatial_index import split_lines
+
+DATA_DIR = "data"
+STORE_DIR = os.path.join(DATA_DIR, "processed")
+MANIFEST_FILE = os.path.join(STORE_DIR, "manifest.json")
+
+PROJECTED_CRS = "EPSG:32610"
+GEOGRAPHIC_CRS = "EPSG:4326"
+STORE_CRS = (PROJECTED_CRS, GEOGRAPHIC_CRS)
+
+DISSOLVE_TILE_SIZE = 250.0  # Tile edge in meters for large dissolved unions
+DISSOLVE_MAX_VERTICES = 5000  # Unions with more vertices than this are tiled
+SEGMENT_LENGTH = 50.0  # Target length in meters of segmented line layers
+SIMPLIFY_TOLERANCES = (0.5, 2.0, 10.0)  # Meters; the levels of the simplified pyramid
+FEATURE_ID_COLUMN = "OBJECTID"  # Stable feature identifier used to diff republished layers
+STORE_FORMAT = 2  # Bump when the layout of stored layers changes so they are re-ingested
+ROW_GROUP_SIZE = 256  # Rows per Parquet row group; small groups let bbox reads skip most of a layer
+ROW_ORDER_COLUMN = "_row"  # Source row position of each stored row
+
+BBox = Tuple[float, float, float, float]
+
+def file_hash(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def atomic_write(path: str, write: Callable[[str], None], suffix: str = ".tmp") -> None:
+    """Call `write` with a private temporary path, then move the result over `path` in one step.
+
+    Concurrent readers see either the old file or the new one, never a partial write.
+    `suffix` ends the temporary name, for writers that append their own extension.
+    """
+    tmp_path = f"{path}.{os.getpid()}{suffix}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_json(path: str, value) -> None:
+    """Atomically write `value` as indented JSON."""
+    def dump(tmp_path: str) -> None:
+        with open(tmp_path, "w") as f:
+            json.dump(value, f, indent=2, sort_keys=True)
+    atomic_write(path, dump)
+
+def store_path(source_path: str, crs: str) -> str:
+    """Return the GeoParquet path holding `source_path` in the given CRS."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    epsg = crs.split(":")[-1]
+    return os.path.join(STORE_DIR, f"{stem}.{epsg}.parquet")
+
+def write_geoparquet(gdf: gpd.GeoDataFrame, path: str) -> None:
+    """Atomically write a layer in Hilbert order with a covering bbox column."""
+    ordered = gdf.assign(**{ROW_ORDER_COLUMN: np.arange(len(gdf))})
+    if len(ordered):
+        ordered = ordered.iloc[np.argsort(ordered.hilbert_distance().to_numpy(), kind="stable")]
+    atomic_write(path, lambda tmp_path: ordered.to_parquet(
+        tmp_path, index=False, write_covering_bbox=True, row_group_size=ROW_GROUP_SIZE
+    ))
+
+def read_geoparquet(path: str, bbox: Optional[BBox] = None) -> gpd.GeoDataFrame:
+    """Read a layer written by `write_geoparquet` in source order, optionally only the rows whose bounds meet `bbox`."""
+    gdf = gpd.read_parquet(path, bbox=bbox)
+    if ROW_ORDER_COLUMN in gdf.columns:
+        gdf = gdf.sort_values(ROW_ORDER_COLUMN).drop(columns=ROW_ORDER_COLUMN).reset_index(drop=True)
+    return gdf
+
+def read_manifest() -> Dict[str, dict]:
+    """Load the ingestion manifest, or an empty one if nothing was ingested yet."""
+    try:
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Unreadable layer store manifest {MANIFEST_FILE}, rebuilding: {e}")
+        return {}
+
+def write_manifest(manifest: Dict[str, dict]) -> None:
+    """Atomically replace the manifest so concurrent readers never see a partial file."""
+    os.makedirs(STORE_DIR, exist_ok=True)
+    write_json(MANIFEST_FILE, manifest)
+
+def _source_key(source_path: str) -> str:
+    return os.path.normpath(source_path)
+
+def changes_path(source_path: str) -> str:
+    """Return the Parquet path holding the feature changes of the last re-ingestion of `source_path`."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(STORE_DIR, f"{stem}.changes.parquet")
+
+def feature_hashes(gdf: gpd.GeoDataFrame, id_column: str = FEATURE_ID_COLUMN) -> pd.Series:
+    """Return a content hash of each feature's geometry and attributes, indexed by `id_column`."""
+    geometry_hashes = [hashlib.sha1(wkb).hexdigest() for wkb in shapely.to_wkb(gdf.geometry.to_numpy())]
+    attributes = gdf.drop(columns=gdf.geometry.name)
+    attribute_hashes = pd.util.hash_pandas_object(attributes, index=False).astype(str).to_numpy()
+    hashes = pd.Series(np.char.add(np.array(geometry_hashes, dtype=str), attribute_hashes), index=gdf[id_column].to_numpy())
+    return hashes[~hashes.index.duplicated()]
+
+def diff_layers(old: gpd.GeoDataFrame, new: gpd.GeoDataFrame,
+                id_column: str = FEATURE_ID_COLUMN) -> Optional[pd.DataFrame]:
+    """Return the id, kind and bounds of every feature added, removed or modified between two versions.
+
+    A modified feature contributes both its old and its new bounds. Returns None when the
+    layers have no id column to match features by.
+    """
+    if id_column not in old.columns or id_column not in new.columns:
+        return None
+    hashes = pd.concat({"old": feature_hashes(old, id_column), "new": feature_hashes(new, id_column)}, axis=1)
+    changed = hashes[hashes["old"] != hashes["new"]]
+    kind = np.where(changed["old"].isna(), "added", np.where(changed["new"].isna(), "removed", "modified"))
+    kinds = pd.Series(kind, index=changed.index)
+    frames = []
+    for gdf in (old, new):
+        rows = gdf[gdf[id_column].isin(changed.index)]
+        bounds = pd.DataFrame(shapely.bounds(rows.geometry.to_numpy()), columns=["minx", "miny", "maxx", "maxy"])
+        bounds.insert(0, id_column, rows[id_column].to_numpy())
+        frames.append(bounds)
+    changes = pd.concat(frames, ignore_index=True)
+    changes.insert(1, "change", kinds.reindex(changes[id_column]).to_numpy())
+    return changes
+
+def read_changes(source_path: str, from_hash: str) -> Optional[np.ndarray]:
+    """Return the (n, 4) projected bounds of the features changed since the version `from_hash`.
+
+    Only the latest re-ingestion is kept; returns None when it did not start from
+    `from_hash` (or could not be diffed), meaning everything must be treated as changed.
+    """
+    entry = ensure_layer(source_path)
+    if entry["sha256"] == from_hash:
+        return np.empty((0, 4))
+    changes = entry.get("changes")
+    if changes is None or changes["from"] != from_hash:
+        return None
+    try:
+        return pd.read_parquet(changes_path(source_path))[["minx", "miny", "maxx", "maxy"]].to_numpy()
+    except OSError as e:
+        logging.warning(f"Feature changes of {source_path} unreadable: {e}")
+        return None
+
+def ingest_layer(source_path: str, source_hash: Optional[str] = None) -> dict:
+    """Convert one GeoJSON layer into the store and record it in the manifest.
+
+    If an older version of the layer is in the store, the features that changed are
+    recorded first.
+    """
+    if source_hash is None:
+        source_hash = file_hash(source_path)
+    gdf = gpd.read_file(source_path)
+    if gdf.crs is None:
+        gdf = gdf.set_crs(GEOGRAPHIC_CRS)
+    os.makedirs(STORE_DIR, exist_ok=True)
+    previous = read_manifest().get(_source_key(source_path))
+    changes = None
+    if previous is not None and previous["sha256"] != source_hash:
+        changes = _record_changes(source_path, previous, gdf.to_crs(PROJECTED_CRS))
+    outputs = {}
+    for crs in STORE_CRS:
+        out_path = store_path(source_path, crs)
+        write_geoparquet(gdf.to_crs(crs), out_path)
+        outputs[crs] = out_path
+    stat = os.stat(source_path)
+    entry = {
+        "sha256": source_hash,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "features": len(gdf),
+        "format": STORE_FORMAT,
+        "outputs": outputs,
+    }
+    if changes is not None:
+        entry["changes"] = changes
+    manifest = read_manifest()
+    manifest[_source_key(source_path)] = entry
+    write_manifest(manifest)
+    logging.info(f"Ingested {source_path} ({len(gdf)} features) into {STORE_DIR}")
+    return entry
+
+def _record_changes(source_path: str, previous: dict, new_gdf: gpd.GeoDataFrame) -> Optional[dict]:
+    try:
+        old_gdf = read_geoparquet(previous["outputs"][PROJECTED_CRS])
+    except (OSError, KeyError) as e:
+        logging.warning(f"Previous version of {source_path} unavailable, cannot diff it: {e}")
+        return None
+    changes = diff_layers(old_gdf, new_gdf)
+    if changes is None:
+        logging.warning(f"{source_path} has no {FEATURE_ID_COLUMN} column; treating every feature as changed.")
+        return None
+    atomic_write(changes_path(source_path), lambda tmp_path: changes.to_parquet(tmp_path, index=False))
+    counts = changes.drop_duplicates(FEATURE_ID_COLUMN)["change"].value_counts().to_dict()
+    logging.info(f"Changes in {source_path}: {counts or 'none'}")
+    return {"from": previous["sha256"], "count": int(changes[FEATURE_ID_COLUMN].nunique())}
+
+def data_version(manifest: Optional[Dict[str, dict]] = None) -> str:
+    """Return a short digest of every ingested source's hash; it changes whenever any layer does."""
+    if manifest is None:
+        manifest = read_manifest()
+    digest = hashlib.sha256()
+    for key in sorted(manifest):
+        digest.update(f"{key}:{manifest[key]['sha256']}\n".encode())
+    return digest.hexdigest()[:16]
+
+def ensure_layer(source_path: str) -> dict:
+    """Return the manifest entry for a layer, rebuilding it if the source changed.
+
+    The size and mtime recorded at ingestion short-circuit the check; the content
+    hash is only recomputed when either of them differs.
+    """
+    manifest = read_manifest()
+    key = _source_key(source_path)
+    entry = manifest.get(key)
+    stat = os.stat(source_path)
+    outputs_present = entry is not None and entry.get("format") == STORE_FORMAT and all(
+        os.path.exists(path) for path in entry.get("outputs", {}).values()
+    )
+    if outputs_present and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry
+    source_hash = file_hash(source_path)
+    if outputs_present and entry["sha256"] == source_hash:
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        manifest[key] = entry
+        write_manifest(manifest)
+        return entry
+    logging.info(f"Layer {source_path} is new or changed; rebuilding columnar copies.")
+    return ingest_layer(source_path, source_hash)
+
+def read_layer(source_path: str, crs: str = GEOGRAPHIC_CRS, bbox: Optional[BBox] = None,
+               mask=None) -> gpd.GeoDataFrame:
+    """Read a layer from the store in `crs`, falling back to the GeoJSON if the store is unusable.
+
+    `bbox` (in `crs`) limits the read to features whose bounds meet it, and `mask` (a
+    geometry in `crs`) to features intersecting it; both are pushed down to the
+    Parquet row groups, or to pyogrio when reading the GeoJSON.
+    """
+    if mask is not None and bbox is None:
+        bbox = tuple(shapely.bounds(mask))
+    if crs not in STORE_CRS:
+        window = None
+        if bbox is not None:
+            window = gpd.GeoSeries([mask if mask is not None else shapely.box(*bbox)], crs=crs).to_crs(GEOGRAPHIC_CRS)[0]
+        gdf = read_layer(source_path, GEOGRAPHIC_CRS, mask=window).to_crs(crs)
+    else:
+        try:
+            entry = ensure_layer(source_path)
+            gdf = read_geoparquet(entry["outputs"][crs], bbox=bbox)
+        except OSError as e:
+            if not os.path.exists(source_path):
+                raise
+            logging.warning(f"Layer store unavailable for {source_path}, parsing GeoJSON directly: {e}")
+            window = None
+            if bbox is not None:
+                window = gpd.GeoSeries([shapely.box(*bbox)], crs=crs)
+            gdf = gpd.read_file(source_path, bbox=window).to_crs(crs)
+    if mask is not None:
+        gdf = gdf[gdf.intersects(mask)]
+    return gdf
+
+def derived_path(source_path: str, kind: str) -> str:
+    """Return the GeoParquet path holding a derived product (e.g. "dissolved") of `source_path`."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(STORE_DIR, f"{stem}.{kind}.{PROJECTED_CRS.split(':')[-1]}.parquet")
+
+def _ensure_derived(source_path: str, kind: str,
+                    build: Callable[[gpd.GeoDataFrame], gpd.GeoDataFrame]) -> str:
+    """Build a derived product from the projected layer unless it is current with the source hash."""
+    entry = ensure_layer(source_path)
+    out_path = derived_path(source_path, kind)
+    derived = entry.get("derived", {})
+    if derived.get(kind) == entry["sha256"] and os.path.exists(out_path):
+        return out_path
+    gdf = read_geoparquet(entry["outputs"][PROJECTED_CRS])
+    result = build(gdf)
+    write_geoparquet(result, out_path)
+    manifest = read_manifest()
+    manifest[_source_key(source_path)] = dict(entry, derived=dict(derived, **{kind: entry["sha256"]}))
+    write_manifest(manifest)
+    logging.info(f"Built {kind} copy of {source_path}: {len(gdf)} features -> {len(result)} rows")
+    return out_path
+
+def _read_derived(source_path: str, kind: str, build: Callable[[gpd.GeoDataFrame], gpd.GeoDataFrame],
+                  bbox: Optional[BBox] = None) -> gpd.GeoDataFrame:
+    try:
+        return read_geoparquet(_ensure_derived(source_path, kind, build), bbox=bbox)
+    except OSError as e:
+        logging.warning(f"Layer store unavailable for {kind} copy of {source_path}, building in memory: {e}")
+        result = build(read_layer(source_path, PROJECTED_CRS))
+        return result if bbox is None else result.cx[bbox[0]:bbox[2], bbox[1]:bbox[3]]
+
+def dissolve_geometries(geometries, tile_size: float = DISSOLVE_TILE_SIZE,
+                        max_vertices: int = DISSOLVE_MAX_VERTICES) -> np.ndarray:
+    """Union polygons into one valid geometry, split into `tile_size` squares if it is large."""
+    union = shapely.make_valid(shapely.union_all(shapely.make_valid(np.asarray(geometries, dtype=object))))
+    # make_valid can leave slivers as lines or points; only the polygonal part has area
+    parts = shapely.get_parts(union)
+    union = shapely.multipolygons(parts[shapely.get_type_id(parts) == 3])
+    if shapely.get_num_coordinates(union) <= max_vertices:
+        return np.array([union], dtype=object)
+    xmin, ymin, xmax, ymax = union.bounds
+    xs = np.arange(xmin, xmax, tile_size)
+    ys = np.arange(ymin, ymax, tile_size)
+    x0, y0 = (a.ravel() for a in np.meshgrid(xs, ys))
+    tiles = shapely.intersection(union, shapely.box(x0, y0, x0 + tile_size, y0 + tile_size))
+    return tiles[~shapely.is_empty(tiles) & (shapely.area(tiles) > 0)]
+
+def _dissolve(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(geometry=dissolve_geometries(gdf.geometry.to_numpy()), crs=PROJECTED_CRS)
+
+def _segment(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    pieces, source_rows = split_lines(gdf.geometry.to_numpy(), SEGMENT_LENGTH)
+    segments = gdf.drop(columns=gdf.geometry.name).iloc[source_rows].reset_index(drop=True)
+    segments["source_row"] = source_rows
+    return gpd.GeoDataFrame(segments, geometry=pieces, crs=PROJECTED_CRS)
+
+def _simplifier(tolerance: float) -> Callable[[gpd.GeoDataFrame], gpd.GeoDataFrame]:
+    def simplify(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        # preserve_topology keeps every feature valid and non-empty at any tolerance
+        geometries = shapely.simplify(gdf.geometry.to_numpy(), tolerance, preserve_topology=True)
+        return gdf.set_geometry(geometries, crs=PROJECTED_CRS)
+    return simplify
+
+def simplified_kind(tolerance: float) -> str:
+    """Return the derived-product name of the pyramid level at `tolerance` meters."""
+    return f"simplified-{tolerance:g}m"
+
+def ensure_dissolved(source_path: str) -> str:
+    """Return the dissolved copy of a polygon layer, rebuilding it if its source changed."""
+    return _ensure_derived(source_path, "dissolved", _dissolve)
+
+def read_dissolved(source_path: str, bbox: Optional[BBox] = None) -> gpd.GeoDataFrame:
+    """Read the dissolved, tiled union of a polygon layer in EPSG:32610, optionally only the tiles meeting `bbox`."""
+    return _read_derived(source_path, "dissolved", _dissolve, bbox)
+
+def ensure_segmented(source_path: str) -> str:
+    """Return the segmented copy of a line layer, rebuilding it if its source changed."""
+    return _ensure_derived(source_path, "segments", _segment)
+
+def read_segmented(source_path: str, bbox: Optional[BBox] = None) -> gpd.GeoDataFrame:
+    """Read a line layer cut into short segments in EPSG:32610, optionally only the segments meeting `bbox`.
+
+    Each segment keeps its line's attributes plus `source_row`, the line's row in the layer.
+    """
+    return _read_derived(source_path, "segments", _segment, bbox)
+
+def ensure_simplified(source_path: str, tolerance: float) -> str:
+    """Return one pyramid level of a layer, rebuilding it if its source changed."""
+    return _ensure_derived(source_path, simplified_kind(tolerance), _simplifier(tolerance))
+
+def read_simplified(source_path: str, tolerance: float, crs: str = PROJECTED_CRS) -> gpd.GeoDataFrame:
+    """Read a layer simplified with a topology-preserving `tolerance` in meters."""
+    gdf = _read_derived(source_path, simplified_kind(tolerance), _simplifier(tolerance))
+    return gdf if crs == PROJECTED_CRS else gdf.to_crs(crs)
+
+def ingest_all(data_dir: str = DATA_DIR, dissolve: Iterable[str] = (), segment: Iterable[str] = (),
+               tolerances: Iterable[float] = SIMPLIFY_TOLERANCES) -> Dict[str, dict]:
+    """Ingest (or refresh) every GeoJSON file in `data_dir`, then build the derived copies."""
+    entries = {
+        source_path: ensure_layer(source_path)
+        for source_path in sorted(glob.glob(os.path.join(data_dir, "*.geojson")))
+    }
+    tolerances = tuple(tolerances)
+    for source_path in entries:
+        for tolerance in tolerances:
+            ensure_simplified(source_path, tolerance)
+    for source_path in dissolve:
+        ensure_dissolved(source_path)
+    for source_path in segment:
+        ensure_segmented(source_path)
+    return entries
+
+if __name__ == "__main__":
+    from geo_processing import HAZARD_FILES, CONTOUR_FILE
+
+    logging.basicConfig(level=logging.INFO)
+    for source_path, entry in ingest_all(dissolve=HAZARD_FILES.values(), segment=[CONTOUR_FILE]).items():
+        print(f"{source_path}: {entry['features']} features, sha256 {entry['sha256'][:12]}")
@@ -0,0 +1,106 @@
+"""Persistent cache of Gemini responses shared by every worker process.
+
+Responses are keyed by a hash of the model name, the generation config, the system
+instruction and the prompt, so a byte-identical request (the same parcel analyzed
+again by someone else) is answered from disk. Each entry keeps the raw response text
+and, when the caller parsed it, the parsed JSON object, so a hit skips the parsing too.
+
+Entries live for `LLM_CACHE_TTL` seconds. When the stored responses grow past
+`LLM_CACHE_MAX_BYTES` the least recently used ones are evicted.
+
+Usage: ``python llm_cache.py`` purges expired entries and prints the counters.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Optional, Tuple
+
+from layer_store import STORE_DIR
+from sqlite_store import SqliteStore
+
+LLM_CACHE_FILE = os.path.join(STORE_DIR, "llm_cache.sqlite")
+LLM_CACHE_TTL = 7 * 24 * 3600  # Seconds a response stays cached
+LLM_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Stored text and parsed JSON kept before LRU eviction
+
+def response_key(model_name: str, prompt: str, generation_config: Optional[dict] = None,
+                 system_instruction: str = "") -> str:
+    """Return the content address of a request: a SHA-256 over model, config, system instruction and prompt."""
+    digest = hashlib.sha256()
+    config = json.dumps(generation_config or {}, sort_keys=True, default=str)
+    for part in (model_name, config, system_instruction, prompt):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class ResponseCache(SqliteStore):
+    """SQLite-backed {request hash: (raw text, parsed object)} cache with TTL and LRU size cap."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, text TEXT NOT NULL, parsed TEXT, size INTEGER NOT NULL, "
+        "created_at REAL NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)",
+    )
+
+    def __init__(self, path: str = LLM_CACHE_FILE, ttl: float = LLM_CACHE_TTL,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        """Return (raw text, parsed object or None) for a cached request, or None on a miss or an expired entry."""
+        connection = self._connection()
+        row = connection.execute("SELECT text, parsed, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.record("miss")
+            return None
+        text, parsed, expires_at = row
+        now = time.time()
+        if expires_at <= now:
+            self.record("expired")
+            return None
+        connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self.record("hit")
+        return text, json.loads(parsed) if parsed is not None else None
+
+    def put(self, key: str, text: str, parsed: Any = None) -> None:
+        """Cache a response's raw text and, optionally, its parsed JSON-serializable form."""
+        now = time.time()
+        parsed_json = json.dumps(parsed) if parsed is not None else None
+        size = len(text.encode()) + (len(parsed_json.encode()) if parsed_json is not None else 0)
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, text, parsed, size, created_at, expires_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, text, parsed_json, size, now, now + self.ttl, now),
+        )
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until the cache fits `max_bytes`."""
+        connection = self._connection()
+        removed = connection.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),)).rowcount
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            # Walk from the least recently used entry until enough bytes are freed
+            cutoff = None
+            excess = total - self.max_bytes
+            for last_used, size in connection.execute("SELECT last_used, size FROM responses ORDER BY last_used"):
+                excess -= size
+                cutoff = last_used
+                if excess <= 0:
+                    break
+            removed += connection.execute("DELETE FROM responses WHERE last_used <= ?", (cutoff,)).rowcount
+        if removed:
+            logging.debug(f"Evicted {removed} cached Gemini responses")
+        return removed
+
+response_cache = ResponseCache()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    removed = response_cache.evict()
+    print(f"Evicted {removed} entries; counters: {response_cache.metrics()}")
@@ -0,0 +1,273 @@
+"""Offline geocoder over Mercer Island's address points.
+
+An address-point file (e.g. the King County address point layer clipped to the
+island) is imported once into a small Parquet table in the layer store. At run time
+the table is loaded into a `LocalGeocoder`:
+
+- Exact matches on the normalized street address are a single dictionary probe.
+- Misspelled input is matched by a bounded edit-distance search over the prefix trie
+  of all addresses, below the node of its exact house number. Numbers in the street
+  name (e.g. "86th") must match too; only the words may be misspelled.
+- Autocomplete walks the same trie from a typed prefix, and from every node within a
+  small edit distance of it when the exact prefix has too few completions. As in
+  matching, the house number must be typed exactly; text without one is completed
+  against a second trie of street names.
+
+Street suffixes and directionals are normalized to their USPS abbreviations first,
+so "4000 86th Avenue Southeast" and "4000 86TH AVE SE" are the same key.
+
+Usage: ``python local_geocoder.py <address point file> [address column] [zip column]``
+"""
+import os
+import re
+import sys
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import geopandas as gpd
+
+from layer_store import STORE_DIR, GEOGRAPHIC_CRS, atomic_write
+from models import Address, Coordinates
+
+ADDRESS_POINTS_TABLE = os.path.join(STORE_DIR, "address_points.parquet")
+ADDRESS_COLUMN = "ADDR_FULL"  # Full street address column of the King County address points
+ZIP_COLUMN = "ZIP5"
+MAX_EDIT_DISTANCE = 2  # Largest number of character edits a fuzzy match may need
+MIN_FUZZY_PREFIX = 4  # Shortest typed prefix for which suggestions tolerate typos
+
+STREET_ABBREVIATIONS = {
+    "avenue": "ave", "av": "ave", "street": "st", "str": "st", "place": "pl", "lane": "ln",
+    "drive": "dr", "road": "rd", "court": "ct", "crt": "ct", "boulevard": "blvd", "terrace": "ter",
+    "circle": "cir", "parkway": "pkwy", "highway": "hwy", "way": "way", "point": "pt", "key": "ky",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+}
+
+def normalize_street(street: str) -> str:
+    """Return the canonical form of a street address: lowercase tokens with USPS abbreviations."""
+    tokens = re.sub(r"[^\w\s]", " ", street.lower()).split()
+    return " ".join(STREET_ABBREVIATIONS.get(token, token) for token in tokens)
+
+def house_number(normalized: str) -> str:
+    """Return the leading house number of a normalized street address, or ""."""
+    first = normalized.split(" ", 1)[0]
+    return first if re.fullmatch(r"\d+[a-z]?", first) else ""
+
+def _numbers(normalized: str) -> List[str]:
+    return re.findall(r"\d+", normalized)
+
+class _Node:
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.value = None
+
+class AddressTrie:
+    """Character trie over normalized addresses, supporting prefix completion and bounded edit-distance search."""
+
+    def __init__(self):
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, key: str, value) -> None:
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+        if node.value is None:
+            self._size += 1
+        node.value = value
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, object]]:
+        """Return up to `limit` (key, value) pairs starting with `prefix`, in key order."""
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return self._collect(prefix, node, limit)
+
+    @staticmethod
+    def _collect(prefix: str, node: _Node, limit: int) -> List[Tuple[str, object]]:
+        results = []
+        stack = [(prefix, node)]
+        while stack and len(results) < limit:
+            key, node = stack.pop()
+            if node.value is not None:
+                results.append((key, node.value))
+            stack.extend((key + char, child) for char, child in sorted(node.children.items(), reverse=True))
+        return results
+
+    def fuzzy_complete(self, prefix: str, max_distance: int, limit: int = 10,
+                       base: str = "") -> List[Tuple[int, str, object]]:
+        """Return up to `limit` (distance, key, value) whose start is within `max_distance` edits of `prefix`.
+
+        Only keys starting with `base` are considered, and `prefix` is compared with what
+        follows it. Closer starts come first; a branch is abandoned as in `search`.
+        """
+        start = self._root
+        for char in base:
+            start = start.children.get(char)
+            if start is None:
+                return []
+        matches = []
+        first_row = list(range(len(prefix) + 1))
+        stack = [(child, char, base + char, first_row) for char, child in start.children.items()]
+        while stack:
+            node, char, path, previous = stack.pop()
+            row = [previous[0] + 1]
+            for column in range(1, len(prefix) + 1):
+                row.append(min(
+                    row[column - 1] + 1,
+                    previous[column] + 1,
+                    previous[column - 1] + (prefix[column - 1] != char),
+                ))
+            if row[-1] <= max_distance:
+                # Everything below this node starts with a close match of the prefix
+                matches.append((row[-1], path, node))
+            elif min(row) <= max_distance:
+                stack.extend((child, next_char, path + next_char, row) for next_char, child in node.children.items())
+        results = []
+        for distance, path, node in sorted(matches, key=lambda match: (match[0], match[1])):
+            for key, value in self._collect(path, node, limit - len(results)):
+                results.append((distance, key, value))
+            if len(results) >= limit:
+                break
+        return results
+
+    def search(self, key: str, max_distance: int, prefix: str = "") -> List[Tuple[int, str, object]]:
+        """Return every (distance, key, value) within `max_distance` Levenshtein edits of `key`.
+
+        Only keys starting with `prefix` are considered, and `key` is compared with the rest
+        of them. Walks the trie keeping one dynamic-programming row per node and abandons a
+        branch as soon as every entry of its row exceeds `max_distance`.
+        """
+        start = self._root
+        for char in prefix:
+            start = start.children.get(char)
+            if start is None:
+                return []
+        results = []
+        first_row = list(range(len(key) + 1))
+        stack = [(child, char, prefix + char, first_row) for char, child in start.children.items()]
+        while stack:
+            node, char, path, previous = stack.pop()
+            row = [previous[0] + 1]
+            for column in range(1, len(key) + 1):
+                row.append(min(
+                    row[column - 1] + 1,
+                    previous[column] + 1,
+                    previous[column - 1] + (key[column - 1] != char),
+                ))
+            if node.value is not None and row[-1] <= max_distance:
+                results.append((row[-1], path, node.value))
+            if min(row) <= max_distance:
+                stack.extend((child, next_char, path + next_char, row) for next_char, child in node.children.items())
+        return sorted(results, key=lambda result: (result[0], result[1]))
+
+class LocalGeocoder:
+    """In-memory address index built from address points."""
+
+    def __init__(self, points: Iterable[Tuple[str, float, float]]):
+        self._exact: Dict[str, Tuple[str, Coordinates]] = {}
+        self._trie = AddressTrie()
+        self._streets = AddressTrie()
+        for address, latitude, longitude in points:
+            key = normalize_street(address)
+            if key and key not in self._exact:
+                entry = (address, Coordinates(latitude=latitude, longitude=longitude))
+                self._exact[key] = entry
+                self._trie.insert(key, entry)
+                number = house_number(key)
+                if number and len(key) > len(number):
+                    self._streets.insert(key[len(number) + 1:], (address.split(None, 1)[1], None))
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    @classmethod
+    def from_table(cls, path: str = ADDRESS_POINTS_TABLE) -> "LocalGeocoder":
+        """Load the imported address-point table; an empty geocoder if none was imported."""
+        try:
+            table = pd.read_parquet(path)
+        except FileNotFoundError:
+            logging.info(f"No address points at {path}; geocoding falls back to Nominatim.")
+            return cls([])
+        geocoder = cls(zip(table["address"], table["latitude"], table["longitude"]))
+        logging.info(f"Local geocoder indexed {len(geocoder)} addresses from {path}")
+        return geocoder
+
+    def geocode(self, address: Address) -> Optional[Coordinates]:
+        """Resolve an address to coordinates, or None when there is no unambiguous match."""
+        key = normalize_street(address.street)
+        entry = self._exact.get(key)
+        if entry is not None:
+            return entry[1]
+        number = house_number(key)
+        if not number:
+            return None
+        street = key[len(number) + 1:]
+        max_distance = min(MAX_EDIT_DISTANCE, len(street) // 5)
+        matches = [
+            (distance, candidate) for distance, candidate, _ in self._trie.search(street, max_distance, f"{number} ")
+            if _numbers(candidate) == _numbers(key)
+        ]
+        # Two equally close candidates are a guess, not a match
+        if not matches or (len(matches) > 1 and matches[0][0] == matches[1][0]):
+            return None
+        logging.debug(f"Fuzzy-matched '{address.street}' to '{matches[0][1]}' ({matches[0][0]} edits)")
+        return self._exact[matches[0][1]][1]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Return up to `limit` known street addresses starting with `prefix`."""
+        return [address for _, (address, _) in self._trie.complete(normalize_street(prefix), limit)]
+
+    def suggest(self, text: str, limit: int = 10) -> List[str]:
+        """Return up to `limit` known street addresses for partly typed, possibly misspelled text.
+
+        Exact prefix completions come first; typo-tolerant ones fill the rest.
+        """
+        prefix = normalize_street(text)
+        if not prefix:
+            return []
+        number = house_number(prefix)
+        trie, base = (self._trie, f"{number} ") if number else (self._streets, "")
+        suggestions = [address for _, (address, _) in trie.complete(prefix, limit)]
+        typed = prefix[len(base):] if prefix.startswith(base) else ""
+        if len(suggestions) < limit and len(typed) >= MIN_FUZZY_PREFIX:
+            max_distance = 1 if len(typed) < 10 else MAX_EDIT_DISTANCE
+            for _, _, (address, _) in trie.fuzzy_complete(typed, max_distance, limit, base):
+                if address not in suggestions:
+                    suggestions.append(address)
+                if len(suggestions) >= limit:
+                    break
+        return suggestions
+
+def import_address_points(source_path: str, address_column: str = ADDRESS_COLUMN,
+                          zip_column: Optional[str] = ZIP_COLUMN) -> pd.DataFrame:
+    """Read an address-point file and store its addresses and coordinates in the layer store."""
+    points = gpd.read_file(source_path)
+    if points.crs is not None:
+        points = points.to_crs(GEOGRAPHIC_CRS)
+    points = points[points.geometry.notna() & points[address_column].notna()]
+    centers = points.geometry.representative_point()
+    table = pd.DataFrame({
+        "address": points[address_column].astype(str).str.strip().to_numpy(),
+        "zip_code": points[zip_column].astype(str).to_numpy() if zip_column in points.columns else None,
+        "latitude": centers.y.to_numpy(),
+        "longitude": centers.x.to_numpy(),
+    })
+    os.makedirs(STORE_DIR, exist_ok=True)
+    atomic_write(ADDRESS_POINTS_TABLE, lambda tmp_path: table.to_parquet(tmp_path, index=False))
+    logging.info(f"Imported {len(table)} address points from {source_path} into {ADDRESS_POINTS_TABLE}")
+    return table
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if not 2 <= len(sys.argv) <= 4:
+        raise SystemExit(__doc__)
+    import_address_points(*sys.argv[1:])
@@ -26,10 +26,21 @@ class Property(BaseModel):
     geometry: dict = Field(..., description="GeoJSON geometry of the property")
 
 class SlopeData(BaseModel):
-    """Model for slope data extracted from contours."""
-    average_slope: float = Field(..., description="Average slope in degrees")
-    max_slope: float = Field(..., description="Maximum slope in degrees")
-    average_distance: float = Field(default=0.0, description="Average distance between contour intersections in meters")
+    """Model for slope data computed from the gridded DEM."""
+    average_slope: float = Field(..., description="Area-weighted mean slope in degrees")
+    max_slope: float = Field(..., description="Maximum cell slope in degrees")
+    elevation_difference: float = Field(..., description="Elevation difference across the parcel in meters")
+
+class SlopeDistribution(BaseModel):
+    """Model for the area-weighted slope distribution of a parcel."""
+    p50_slope: float = Field(..., description="Median slope in degrees")
+    p90_slope: float = Field(..., description="90th percentile slope in degrees")
+    p99_slope: float = Field(..., description="99th percentile slope in degrees")
+    fraction_above_15: float = Field(..., description="Fraction of parcel area steeper than 15 degrees")
+    fraction_above_25: float = Field(..., description="Fraction of parcel area steeper than 25 degrees")
+    fraction_above_40: float = Field(..., description="Fraction of parcel area steeper than 40 degrees")
+    histogram_bins: List[float] = Field(..., description="Histogram bin edges in degrees")
+    histogram: List[float] = Field(..., description="Fraction of parcel area in each histogram bin")
 
 class EnvironmentalCheck(BaseModel):
     """Model for environmental hazard checks."""
@@ -70,4 +81,18 @@ class FeasibilityReport(BaseModel):
     verification_needed: List[str] = Field(
         default_factory=list,
         description="List of data points requiring further verification across the entire report (e.g., soil profile)"
-    )
\ No newline at end of file
+    )
+
+class ParcelInputs(BaseModel):
+    """Computed parcel values the Gemini analyses are generated from."""
+    slope_data: SlopeData = Field(..., description="DEM slope of the parcel")
+    environmental_check: EnvironmentalCheck = Field(..., description="Mapped hazards intersecting the parcel")
+    shoreline_distance: Optional[float] = Field(None, description="Distance to the nearest shoreline in meters")
+    slope_distribution: Optional[SlopeDistribution] = Field(None, description="Area-weighted DEM slope distribution")
+
+class ParcelAnalysis(BaseModel):
+    """A parcel's inputs together with the analyses and feasibility report generated from them."""
+    inputs: ParcelInputs = Field(..., description="Values the analyses were generated from")
+    location_analysis: Optional[LocationAnalysis] = Field(None, description="Location analysis results")
+    slope_analysis: Optional[SlopeAnalysis] = Field(None, description="Slope analysis results")
+    feasibility_report: FeasibilityReport = Field(..., description="Feasibility report built on both analyses")
@@ -0,0 +1,63 @@
+"""Precomputed per-parcel tables keyed by PIN.
+
+The tables are built offline by ``precompute.py`` and stored as Parquet next to the
+columnar layers. At request time they are read once into plain dictionaries so a
+lookup costs a single hash probe.
+
+A small JSON manifest records the version of every source each table was built from,
+so a later build can tell which sources changed and update only the affected rows.
+"""
+import os
+import json
+import logging
+from typing import Dict, Optional
+
+import pandas as pd
+
+from layer_store import STORE_DIR, atomic_write, data_version, write_json
+
+HAZARD_TABLE_FILE = os.path.join(STORE_DIR, "hazard_overlap.parquet")
+SHORELINE_TABLE_FILE = os.path.join(STORE_DIR, "shoreline_distance.parquet")
+TABLE_MANIFEST_FILE = os.path.join(STORE_DIR, "tables.json")
+
+# Bump when compute_slope changes so stale slope rows are never read (2: from the DEM gradient)
+SLOPE_TABLE_VERSION = 2
+SLOPE_TABLE_FILE = os.path.join(STORE_DIR, f"slope_stats.v{SLOPE_TABLE_VERSION}.parquet")
+
+# Bump when the DEM slope distribution or its packing changes (2: DEM elevations in meters)
+SLOPE_DISTRIBUTION_TABLE_VERSION = 2
+SLOPE_DISTRIBUTION_TABLE_FILE = os.path.join(
+    STORE_DIR, f"slope_distribution.v{SLOPE_DISTRIBUTION_TABLE_VERSION}.parquet"
+)
+
+def read_table_manifest() -> Dict[str, dict]:
+    """Load the {table path: build record} manifest, or an empty one."""
+    try:
+        with open(TABLE_MANIFEST_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Unreadable table manifest {TABLE_MANIFEST_FILE}, tables will be rebuilt: {e}")
+        return {}
+
+def write_table(table: pd.DataFrame, path: str, sources: Optional[Dict[str, str]] = None) -> None:
+    """Atomically write a PIN-indexed table to Parquet and record the source versions it was built from."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, table.to_parquet)
+    manifest = read_table_manifest()
+    manifest[os.path.normpath(path)] = {"sources": sources or {}, "data_version": data_version(), "rows": len(table)}
+    write_json(TABLE_MANIFEST_FILE, manifest)
+    logging.info(f"Wrote {len(table)} rows to {path}")
+
+def read_table(path: str) -> Dict[str, dict]:
+    """Read a PIN-indexed table into a {PIN: row} dictionary; empty if it was never built."""
+    try:
+        table = pd.read_parquet(path)
+    except FileNotFoundError:
+        logging.info(f"Precomputed table {path} not found; falling back to live computation.")
+        return {}
+    except Exception as e:
+        logging.error(f"Error reading precomputed table {path}: {e}")
+        return {}
+    return table.to_dict("index")
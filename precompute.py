@@ -0,0 +1,175 @@
+"""Offline builds of the island-wide per-parcel tables.
+
+Every parcel and layer is static between data releases, so the expensive geometry
+work is done here once and the interactive path only looks results up by PIN.
+
+Builds are incremental: each table records the version of every source it was built
+from, and when a source is republished only the parcels whose bounding boxes touch its
+changed features (grown by how far that source reaches into the computation) are
+recomputed. A source without a usable diff triggers a full rebuild of its tables.
+
+Usage: ``python precompute.py [--full] [hazards slope shoreline slope_distribution ...]``
+(default: update every table).
+"""
+import os
+import sys
+import time
+import logging
+from typing import Dict, Iterable, Optional, Set
+
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+
+import dem
+from geo_processing import (
+    PROPERTY_FILE, CONTOUR_FILE, HAZARD_FILES, SHORELINE_FILE,
+    get_hazard_overlay, get_shoreline_index, get_dem,
+)
+from layer_store import ensure_layer, read_changes
+from layer_registry import registry
+from parcel_tables import (
+    read_table_manifest, write_table,
+    HAZARD_TABLE_FILE, SLOPE_TABLE_FILE, SHORELINE_TABLE_FILE, SLOPE_DISTRIBUTION_TABLE_FILE,
+)
+
+DEM_SOURCE = "dem"  # Pseudo-source for tables computed from the interpolated grid
+
+def unique_parcels(crs: str = "EPSG:32610") -> gpd.GeoDataFrame:
+    """Return the parcels whose PIN identifies a single polygon.
+
+    A handful of tracts share one PIN across several polygons; a PIN-keyed row would be
+    ambiguous for them, so they are left to the live computation.
+    """
+    parcels = registry.get(PROPERTY_FILE, crs)
+    return parcels[~parcels["PIN"].duplicated(keep=False)]
+
+def _select(parcels: gpd.GeoDataFrame, pins: Optional[Iterable[str]]) -> gpd.GeoDataFrame:
+    return parcels if pins is None else parcels[parcels["PIN"].isin(list(pins))]
+
+def build_hazard_table(pins: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Compute the overlap ratio of every parcel (or just `pins`) with every hazard layer."""
+    parcels = _select(unique_parcels(), pins)
+    start = time.time()
+    ratios = get_hazard_overlay().overlap_ratios_bulk(shapely.make_valid(parcels.geometry.to_numpy()))
+    logging.info(f"Computed hazard overlaps for {len(parcels)} parcels in {time.time() - start:.1f}s")
+    table = pd.DataFrame(ratios, index=pd.Index(parcels["PIN"].to_numpy(), name="PIN"))
+    return table.astype(np.float32)
+
+def build_slope_table(pins: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Compute the DEM mean and maximum slope and elevation difference of every parcel (or just `pins`)."""
+    parcels = _select(unique_parcels(), pins)
+    grid = get_dem()
+    start = time.time()
+    rows = {}
+    for pin, geometry in zip(parcels["PIN"], parcels.geometry):
+        summary = grid.slope_summary(geometry)
+        if summary is not None:
+            rows[pin] = summary
+    logging.info(f"Computed slope for {len(rows)} parcels in {time.time() - start:.1f}s")
+    table = pd.DataFrame.from_dict(rows, orient="index", columns=["average_slope", "max_slope", "elevation_difference"])
+    table.index.name = "PIN"
+    return table
+
+def build_shoreline_table(pins: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Compute the distance from every parcel (or just `pins`) to the nearest shoreline segment."""
+    parcels = _select(unique_parcels(), pins)
+    distances = get_shoreline_index().distances(parcels.geometry.to_numpy())
+    return pd.DataFrame({"shoreline_distance": distances}, index=pd.Index(parcels["PIN"].to_numpy(), name="PIN"))
+
+def build_slope_distribution_table(pins: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Compute the packed DEM slope distribution of every parcel (or just `pins`)."""
+    parcels = _select(unique_parcels(), pins)
+    grid = get_dem()
+    start = time.time()
+    rows = {}
+    for pin, geometry in zip(parcels["PIN"], parcels.geometry):
+        distribution = grid.slope_distribution(geometry)
+        if distribution is not None:
+            rows[pin] = dem.pack_distribution(distribution)
+    logging.info(f"Computed slope distributions for {len(rows)} parcels in {time.time() - start:.1f}s")
+    columns = [f"p{q}" for q in (50, 90, 99)] + [f"h{i}" for i in range(len(dem.SLOPE_HISTOGRAM_BINS) - 1)]
+    table = pd.DataFrame.from_dict(rows, orient="index", columns=columns).astype(np.uint16)
+    table.index.name = "PIN"
+    return table
+
+# Each table lists the sources it reads besides the parcels, with how far in meters a
+# changed feature of that source can reach; None means any change affects every parcel
+TABLE_BUILDERS = {
+    "hazards": (build_hazard_table, HAZARD_TABLE_FILE, {file_path: 0.0 for file_path in HAZARD_FILES.values()}),
+    # Summarizes the same DEM cells as slope_distribution
+    "slope": (build_slope_table, SLOPE_TABLE_FILE, {DEM_SOURCE: dem.DEM_RESOLUTION}),
+    # The nearest shoreline segment can be anywhere along the shore
+    "shoreline": (build_shoreline_table, SHORELINE_TABLE_FILE, {SHORELINE_FILE: None}),
+    # Cell slopes use the neighbouring cells' elevations
+    "slope_distribution": (build_slope_distribution_table, SLOPE_DISTRIBUTION_TABLE_FILE, {DEM_SOURCE: dem.DEM_RESOLUTION}),
+}
+
+def source_version(source: str) -> str:
+    """Return the current version of a table source: the layer's hash, or the contour hash for the DEM."""
+    if source == DEM_SOURCE:
+        get_dem()  # Rebuilds the grid, and records where it changed, if the contours moved on
+        return ensure_layer(CONTOUR_FILE)["sha256"]
+    return ensure_layer(source)["sha256"]
+
+def source_changes(source: str, from_version: str) -> Optional[np.ndarray]:
+    """Return the projected bounds changed in `source` since `from_version`, or None if unknown."""
+    if source == DEM_SOURCE:
+        return dem.read_changes(from_version)
+    return read_changes(source, from_version)
+
+def stale_pins(path: str, sources: Dict[str, Optional[float]], versions: Dict[str, str]) -> Optional[Set[str]]:
+    """Return the PINs of a table invalidated by source changes since it was built, or None for a full rebuild."""
+    record = read_table_manifest().get(os.path.normpath(path))
+    if record is None or not os.path.exists(path):
+        return None
+    parcels = unique_parcels()
+    tree = shapely.STRtree(parcels.geometry.to_numpy())
+    stale = set()
+    for source, margin in sources.items():
+        previous = record["sources"].get(source)
+        if previous == versions[source]:
+            continue
+        bounds = None if previous is None or margin is None else source_changes(source, previous)
+        if bounds is None:
+            logging.info(f"{source} changed without a usable diff; rebuilding {path} in full.")
+            return None
+        boxes = shapely.box(*(bounds + np.array([-margin, -margin, margin, margin])).T)
+        _, parcel_idx = tree.query(boxes)
+        touched = set(parcels["PIN"].to_numpy()[np.unique(parcel_idx)])
+        logging.info(f"{len(bounds)} changed extents in {source} touch {len(touched)} parcels of {path}")
+        stale |= touched
+    return stale
+
+def update_table(name: str, full: bool = False) -> None:
+    """Bring one table up to date, recomputing only the parcels touched by changed sources when possible."""
+    builder, path, dependencies = TABLE_BUILDERS[name]
+    sources = {PROPERTY_FILE: 0.0, **dependencies}
+    versions = {source: source_version(source) for source in sources}
+    stale = None if full else stale_pins(path, sources, versions)
+    if stale is None:
+        write_table(builder(), path, versions)
+        return
+    existing = pd.read_parquet(path)
+    pins = unique_parcels()["PIN"]
+    # New PINs (added or no longer duplicated) have no row yet
+    stale |= set(pins[~pins.isin(existing.index)])
+    if not stale and read_table_manifest()[os.path.normpath(path)]["sources"] == versions:
+        logging.info(f"{path} is up to date.")
+        return
+    kept = existing[existing.index.isin(pins) & ~existing.index.isin(stale)]
+    table = pd.concat([kept, builder(pins=sorted(stale))]) if stale else kept
+    write_table(table.reindex(pins[pins.isin(table.index)]), path, versions)
+
+def main(argv) -> None:
+    full = "--full" in argv
+    table_names = [arg for arg in argv if arg != "--full"]
+    for name in table_names or TABLE_BUILDERS:
+        if name not in TABLE_BUILDERS:
+            raise SystemExit(f"Unknown table '{name}'. Choose from: {', '.join(TABLE_BUILDERS)}")
+        update_table(name, full)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+"""Persistent cache of finished parcel analyses.
+
+A feasibility report depends only on a parcel's computed inputs (hazards, slope,
+shoreline distance), the data layers those came from and the prompts that turned
+them into text. Each parcel's last analysis is stored with the data version and
+prompt version it was made under:
+
+- With the same data and prompt versions, a repeat analysis returns the stored
+  inputs and report, skipping both the geometry work and Gemini.
+- After a data layer changes, the parcel's inputs are recomputed. If they came out
+  the same, the change did not touch the parcel, so the stored report is kept and
+  re-stamped with the new data version.
+- After a prompt change, every entry of the old prompt version is ignored.
+
+Entries are keyed by PIN and a digest of the parcel geometry, because a few tracts
+share one PIN across several polygons.
+
+Usage: ``python report_cache.py`` drops entries made under older prompt versions.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Optional
+
+from layer_store import STORE_DIR
+from models import Property, ParcelInputs, ParcelAnalysis
+from sqlite_store import SqliteStore
+
+REPORT_CACHE_FILE = os.path.join(STORE_DIR, "report_cache.sqlite")
+
+def parcel_key(property: Property) -> str:
+    """Return the cache key of a parcel: its PIN and a digest of its geometry."""
+    digest = hashlib.sha256(json.dumps(property.geometry, sort_keys=True).encode()).hexdigest()
+    return f"{property.parcel_id}:{digest[:16]}"
+
+class ReportCache(SqliteStore):
+    """SQLite-backed {parcel: analysis} cache stamped with data and prompt versions."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS reports ("
+        "parcel TEXT NOT NULL, prompt_version TEXT NOT NULL, data_version TEXT NOT NULL, "
+        "inputs TEXT NOT NULL, analysis TEXT NOT NULL, created_at REAL NOT NULL, "
+        "PRIMARY KEY (parcel, prompt_version))",
+    )
+
+    def __init__(self, path: str = REPORT_CACHE_FILE):
+        super().__init__(path)
+
+    def _row(self, parcel: str, prompt_version: str):
+        return self._connection().execute(
+            "SELECT data_version, inputs, analysis FROM reports WHERE parcel = ? AND prompt_version = ?",
+            (parcel, prompt_version),
+        ).fetchone()
+
+    def get(self, property: Property, prompt_version: str, data_version: str) -> Optional[ParcelAnalysis]:
+        """Return the parcel's stored analysis if it was made under these data and prompt versions."""
+        row = self._row(parcel_key(property), prompt_version)
+        if row is None or row[0] != data_version:
+            return None
+        return ParcelAnalysis.model_validate_json(row[2])
+
+    def get_for_inputs(self, property: Property, prompt_version: str, data_version: str,
+                       inputs: ParcelInputs) -> Optional[ParcelAnalysis]:
+        """Return the parcel's stored analysis if it was made from identical inputs, re-stamping its data version."""
+        parcel = parcel_key(property)
+        row = self._row(parcel, prompt_version)
+        if row is None or row[1] != inputs.model_dump_json():
+            return None
+        if row[0] != data_version:
+            self._connection().execute(
+                "UPDATE reports SET data_version = ? WHERE parcel = ? AND prompt_version = ?",
+                (data_version, parcel, prompt_version),
+            )
+        return ParcelAnalysis.model_validate_json(row[2])
+
+    def put(self, property: Property, prompt_version: str, data_version: str, analysis: ParcelAnalysis) -> None:
+        """Store a parcel's analysis under the data and prompt versions it was made with."""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO reports (parcel, prompt_version, data_version, inputs, analysis, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (parcel_key(property), prompt_version, data_version, analysis.inputs.model_dump_json(),
+             analysis.model_dump_json(), time.time()),
+        )
+
+    def purge(self, prompt_version: str) -> int:
+        """Delete entries made under any other prompt version and return how many were removed."""
+        return self._connection().execute(
+            "DELETE FROM reports WHERE prompt_version != ?", (prompt_version,)
+        ).rowcount
+
+report_cache = ReportCache()
+
+if __name__ == "__main__":
+    from gemini_analysis import prompt_version
+
+    logging.basicConfig(level=logging.INFO)
+    removed = report_cache.purge(prompt_version())
+    print(f"Purged {removed} reports made under older prompt versions")
@@ -0,0 +1,240 @@
+"""Spatial indexes over the static Mercer Island layers.
+
+Indexes are built on shapely 2's STRtree and are meant to be built once per process
+through the layer registry and shared across sessions.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import shapely
+import geopandas as gpd
+from numpy.typing import ArrayLike
+
+def split_lines(lines: ArrayLike, max_length: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Cut (multi)linestrings into connected pieces of about `max_length` (never over twice it).
+
+    Returns the pieces and, for each piece, the position of the input line it came from.
+    """
+    lines = np.asarray(lines, dtype=object)
+    parts, part_source = shapely.get_parts(lines, return_index=True)
+    parts = shapely.segmentize(parts, max_length)
+    coords, vertex_part = shapely.get_coordinates(parts, return_index=True)
+    # A segment joins vertex i to vertex i + 1 of the same part
+    seg_start = np.flatnonzero(vertex_part[:-1] == vertex_part[1:])
+    seg_part = vertex_part[seg_start]
+    seg_length = np.hypot(*(coords[seg_start + 1] - coords[seg_start]).T)
+    cumulative = np.cumsum(seg_length) - seg_length
+    part_offset = np.zeros(len(parts))
+    first_seg = np.flatnonzero(np.r_[True, seg_part[1:] != seg_part[:-1]])
+    part_offset[seg_part[first_seg]] = cumulative[first_seg]
+    seg_bin = np.floor((cumulative - part_offset[seg_part]) / max_length).astype(np.int64)
+    new_piece = np.r_[True, (seg_part[1:] != seg_part[:-1]) | (seg_bin[1:] != seg_bin[:-1])]
+    seg_piece = np.cumsum(new_piece) - 1
+    last_seg = np.r_[new_piece[1:], True]
+    # Each piece is its segments' start vertices plus the end vertex of its last segment
+    piece_coords = np.concatenate([coords[seg_start], coords[seg_start[last_seg] + 1]])
+    piece_index = np.concatenate([seg_piece, seg_piece[last_seg]])
+    order = np.argsort(np.concatenate([2 * np.arange(len(seg_start)), 2 * np.flatnonzero(last_seg) + 1]), kind="stable")
+    pieces = shapely.linestrings(piece_coords[order], indices=piece_index[order])
+    return pieces, part_source[seg_part[new_piece]]
+
+def normalize_pin(pin: str) -> str:
+    """Return the lookup key of a King County PIN: its letters and digits, uppercased.
+
+    People type separators ("003100-0120") and lowercase letters; a few stored PINs
+    contain a dash themselves ("252404TR-A"), so both sides are normalized.
+
+    >>> normalize_pin("003100-0120")
+    '0031000120'
+    >>> normalize_pin(" 312405trct ") == normalize_pin("312405TRCT")
+    True
+    >>> normalize_pin("252404tr-a") == normalize_pin("252404TR-A")
+    True
+    """
+    return "".join(char for char in pin if char.isalnum()).upper()
+
+class ParcelIndex:
+    """Point-in-parcel lookups over the property layer (EPSG:4326)."""
+
+    def __init__(self, parcels_gdf: gpd.GeoDataFrame, pin_column: str = "PIN"):
+        self.geometries = parcels_gdf.geometry.to_numpy()
+        self.pins = parcels_gdf[pin_column].to_numpy()
+        self._tree = shapely.STRtree(self.geometries)
+        shapely.prepare(self.geometries)
+        # Reversed so the first row of a PIN shared by several polygons wins, as in query_point
+        self._pin_positions = {normalize_pin(pin): position for position, pin in reversed(list(enumerate(self.pins)))}
+
+    def __len__(self) -> int:
+        return len(self.geometries)
+
+    def position_of(self, pin: str) -> int:
+        """Return the row position of the parcel with `pin`, however it is typed, or -1."""
+        return self._pin_positions.get(normalize_pin(pin), -1)
+
+    def positions_xy(self, x: ArrayLike, y: ArrayLike) -> np.ndarray:
+        """Return the row position of the parcel containing each (x, y), or -1 where there is none.
+
+        When parcels overlap, the lowest row position wins, matching a scan in file order.
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        positions = np.full(len(x), -1, dtype=np.intp)
+        point_idx, parcel_idx = self._tree.query(shapely.points(x, y))
+        if len(point_idx) == 0:
+            return positions
+        inside = shapely.contains_xy(self.geometries[parcel_idx], x[point_idx], y[point_idx])
+        point_idx, parcel_idx = point_idx[inside], parcel_idx[inside]
+        order = np.lexsort((parcel_idx, point_idx))
+        matched, first = np.unique(point_idx[order], return_index=True)
+        positions[matched] = parcel_idx[order][first]
+        return positions
+
+    def contains_xy(self, x: ArrayLike, y: ArrayLike) -> np.ndarray:
+        """Vectorized PIN lookup: the PIN of the parcel containing each (x, y), or None."""
+        positions = self.positions_xy(x, y)
+        pins = np.full(len(positions), None, dtype=object)
+        found = positions >= 0
+        pins[found] = self.pins[positions[found]]
+        return pins
+
+    def query_point(self, longitude: float, latitude: float) -> int:
+        """Return the row position of the parcel containing the point, or -1."""
+        return int(self.positions_xy(longitude, latitude)[0])
+
+    def lookup(self, longitude: float, latitude: float) -> Optional[str]:
+        """Return the PIN of the parcel containing the point, or None."""
+        position = self.query_point(longitude, latitude)
+        return self.pins[position] if position >= 0 else None
+
+class ShorelineIndex:
+    """Nearest-neighbour distance to the shoreline, split into short indexed segments (EPSG:32610)."""
+
+    def __init__(self, shoreline_geoms: ArrayLike, max_segment_length: float = 50.0):
+        self.segments, _ = split_lines(shoreline_geoms, max_segment_length)
+        self._tree = shapely.STRtree(self.segments)
+
+    def distance(self, geometry) -> float:
+        """Return the distance in meters from `geometry` to the nearest shoreline segment."""
+        return float(self.distances([geometry])[0])
+
+    def distances(self, geometries: ArrayLike) -> np.ndarray:
+        """Vectorized nearest-shoreline distance for an array of projected geometries."""
+        geometries = np.asarray(geometries, dtype=object)
+        result = np.full(len(geometries), np.inf)
+        (input_idx, _), distances = self._tree.query_nearest(geometries, return_distance=True)
+        np.minimum.at(result, input_idx, distances)
+        return result
+
+class HazardOverlay:
+    """Overlap of parcels with several hazard layers in one candidate-filtered pass (EPSG:32610).
+
+    Each layer gets its own STRtree so only polygons whose extent meets the parcel are
+    considered. Candidates that wholly contain the parcel are settled by a prepared
+    predicate; the rest are clipped to the parcel's bounds before the exact intersection,
+    so large hazard polygons never take part in a full overlay.
+
+    `screens` optionally holds a coarse, simplified copy of each layer. In bulk overlays,
+    geometries farther than `screen_tolerance` from the coarse copy cannot touch the layer
+    and skip the exact checks entirely.
+    """
+
+    def __init__(self, layers: Dict[str, ArrayLike], screens: Optional[Dict[str, ArrayLike]] = None,
+                 screen_tolerance: float = 0.0):
+        self.layers = {name: np.asarray(geoms, dtype=object) for name, geoms in layers.items()}
+        self._trees = {name: shapely.STRtree(geoms) for name, geoms in self.layers.items()}
+        for geoms in self.layers.values():
+            shapely.prepare(geoms)
+        # Grow each coarse copy by the tolerance once so screening is a prepared intersects;
+        # mitred corners keep the grown polygon a superset of the exact buffer
+        self.screens = {
+            name: shapely.make_valid(shapely.buffer(np.asarray(geoms, dtype=object), screen_tolerance, join_style="mitre"))
+            for name, geoms in (screens or {}).items()
+        }
+        self._screen_trees = {name: shapely.STRtree(geoms) for name, geoms in self.screens.items()}
+        for geoms in self.screens.values():
+            shapely.prepare(geoms)
+
+    def _screen(self, name: str, geometries: np.ndarray) -> np.ndarray:
+        """Return the positions of `geometries` that may touch layer `name`."""
+        tree = self._screen_trees.get(name)
+        if tree is None:
+            return np.arange(len(geometries))
+        input_idx, _ = tree.query(geometries, predicate="intersects")
+        return np.unique(input_idx)
+
+    def intersects(self, name: str, geometry) -> bool:
+        """Return whether `geometry` touches any polygon of layer `name`."""
+        return len(self._trees[name].query(geometry, predicate="intersects")) > 0
+
+    def overlap_ratios(self, geometry) -> Dict[str, float]:
+        """Return the fraction of `geometry`'s area covered by each layer."""
+        return {name: float(ratios[0]) for name, ratios in self.overlap_ratios_bulk([geometry]).items()}
+
+    def overlap_ratios_bulk(self, geometries: ArrayLike) -> Dict[str, np.ndarray]:
+        """Vectorized overlap ratios for an array of projected geometries, one array per layer."""
+        geometries = np.asarray(geometries, dtype=object)
+        areas = shapely.area(geometries)
+        shapely.prepare(geometries)
+        ratios = {}
+        for name, hazard_geoms in self.layers.items():
+            screened = self._screen(name, geometries)
+            input_idx, hazard_idx = self._trees[name].query(geometries[screened], predicate="intersects")
+            input_idx = screened[input_idx]
+            candidates, hazards = geometries[input_idx], hazard_geoms[hazard_idx]
+            covered = shapely.contains_properly(hazards, candidates)
+            overlap = np.where(covered, areas[input_idx], 0.0)
+            partial = np.flatnonzero(~covered)
+            if len(partial):
+                # clip_by_rect only takes scalar bounds in shapely 2.0
+                bounds = shapely.bounds(candidates[partial])
+                clipped = np.array(
+                    [shapely.clip_by_rect(hazard, *box) for hazard, box in zip(hazards[partial], bounds)],
+                    dtype=object,
+                )
+                overlap[partial] = shapely.area(shapely.intersection(candidates[partial], clipped))
+            overlap_area = np.zeros(len(geometries))
+            np.add.at(overlap_area, input_idx, overlap)
+            ratios[name] = np.divide(overlap_area, areas, out=np.zeros_like(overlap_area), where=areas > 0)
+        return ratios
+
+class ContourIndex:
+    """Segmented contour lines in an STRtree (EPSG:32610).
+
+    `segments_gdf` is the segmented contour layer from the layer store: short pieces that
+    keep `Elevation` and `source_row`, the row of the contour line they were cut from.
+    """
+
+    def __init__(self, segments_gdf: gpd.GeoDataFrame):
+        self.segments_gdf = segments_gdf
+        self.segments = segments_gdf.geometry.to_numpy()
+        self.source_rows = segments_gdf["source_row"].to_numpy()
+        self._tree = shapely.STRtree(self.segments)
+
+    def query(self, geometry) -> np.ndarray:
+        """Return the positions of segments intersecting `geometry`."""
+        return self._tree.query(geometry, predicate="intersects")
+
+    def count_lines(self, geometry) -> int:
+        """Return how many distinct contour lines intersect `geometry`."""
+        return len(np.unique(self.source_rows[self.query(geometry)]))
+
+    def near(self, geometry, distance: float) -> gpd.GeoDataFrame:
+        """Return the segments within `distance` meters of `geometry`."""
+        return self.segments_gdf.iloc[np.sort(self.query(shapely.buffer(geometry, distance)))]
+
+    def intersections(self, geometry, select=None) -> gpd.GeoDataFrame:
+        """Intersect every contour line touching `select` (default `geometry`) with `geometry`.
+
+        Returns one row per contour line in layer order, with the line's attributes and its
+        non-empty intersection assembled from the clipped segments.
+        """
+        positions = self.query(geometry if select is None else select)
+        pieces = shapely.intersection(self.segments[positions], geometry)
+        keep = ~shapely.is_empty(pieces)
+        positions, pieces = positions[keep], pieces[keep]
+        order = np.lexsort((positions, self.source_rows[positions]))
+        positions, pieces = positions[order], pieces[order]
+        _, first, group = np.unique(self.source_rows[positions], return_index=True, return_inverse=True)
+        lines = self.segments_gdf.iloc[positions[first]].drop(columns="source_row")
+        geometries = shapely.geometrycollections(pieces, indices=group) if len(pieces) else pieces
+        return lines.set_geometry(np.asarray(geometries, dtype=object), crs=self.segments_gdf.crs)
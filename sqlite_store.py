@@ -0,0 +1,46 @@
+"""SQLite plumbing shared by the persistent caches next to the layer store.
+
+Each store keeps one connection per thread, since sqlite3 connections must stay on
+the thread that opened them. The database runs in WAL mode so readers never block the
+writer, and every connection waits out a concurrent writer instead of failing. Named
+counters live in the same database so they add up across processes.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Tuple
+
+BUSY_TIMEOUT = 30.0  # Seconds to wait for another process's write to finish
+
+class SqliteStore:
+    """Base class for a SQLite-backed store whose tables are created by the statements in `SCHEMA`."""
+
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS metrics (name TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+        return connection
+
+    def record(self, metric: str) -> None:
+        """Increment a named counter."""
+        self._connection().execute(
+            "INSERT INTO metrics (name, count) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET count = count + 1",
+            (metric,),
+        )
+
+    def metrics(self) -> Dict[str, int]:
+        """Return the counters accumulated by every process."""
+        return dict(self._connection().execute("SELECT name, count FROM metrics").fetchall())